@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+'''Benchmarks.
+
+Times the reading of terms in their textual representation with the ANTLR
+based parser and with the hand-written parser, and their writing with the
+visitor based writer and with the streaming writer. Run as::
+
+	python setup.py bench [file.aterm ...]
+
+where the files are typically produced by translate.py. Without arguments
+a synthetic module of a similar shape is used.
+'''
+
+
+import sys
+import time
+from cStringIO import StringIO
+
+from aterm.factory import factory
+from aterm import lexer
+from aterm import read
+from aterm import write
+
+
+def sample(functions = 200, statements = 100):
+	'''Generate the textual representation of a synthetic module.'''
+	stmts = []
+	for i in range(statements):
+		stmts.append(
+			'Assign(Int(32,Signed),Sym("tmp%d"){Tmp},'
+			'Binary(Plus(Int(32,Signed)),Sym("eax"){Reg},Lit(Int(32,Signed),%d))){Path([%d,0])}'
+			% (i, i, i)
+		)
+		stmts.append('Label(".L%d")' % i)
+	body = '[' + ','.join(stmts) + ']'
+	funcs = []
+	for i in range(functions):
+		funcs.append('Function(Void,"f%d",[],%s)' % (i, body))
+	return 'Module([' + ','.join(funcs) + '])'
+
+
+def timeit(func, *args):
+	'''Best wall clock time of a few runs.'''
+	best = None
+	for i in range(3):
+		start = time.time()
+		func(*args)
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+
+def parseAntlr(buf):
+	return factory._parse(lexer.Lexer(buf))
+
+def parseRead(buf):
+	return read.parse(factory, buf)
+
+
+def writeVisitor(term):
+	fp = StringIO()
+	writer = write.TextWriter(fp)
+	writer.visit(term)
+	return fp.getvalue()
+
+def writeStream(term):
+	fp = StringIO()
+	write.writeText(term, fp)
+	return fp.getvalue()
+
+
+def report(label, elapsed, reference = None):
+	sys.stdout.write('  %-18s %8.3f s' % (label, elapsed))
+	if reference is not None:
+		sys.stdout.write('  (%.1fx)' % (reference/elapsed))
+	sys.stdout.write('\n')
+
+
+def bench(name, buf):
+	sys.stdout.write('%s (%d bytes)\n' % (name, len(buf)))
+	term = parseRead(buf)
+	assert parseAntlr(buf).isEqual(term)
+	antlr = timeit(parseAntlr, buf)
+	report('antlr parser', antlr)
+	report('hand-written', timeit(parseRead, buf), antlr)
+	assert writeVisitor(term) == writeStream(term)
+	visitor = timeit(writeVisitor, term)
+	report('visitor writer', visitor)
+	report('streaming writer', timeit(writeStream, term), visitor)
+
+
+def main(args):
+	if args:
+		for arg in args:
+			bench(arg, open(arg, 'rt').read())
+	else:
+		bench('<sample>', sample())
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
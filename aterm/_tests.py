@@ -3,9 +3,19 @@
 
 
 import unittest
+import tempfile
+from StringIO import StringIO
 
 from aterm.factory import factory
 from aterm import types
+from aterm import term
+from aterm import cache
+from aterm import binary
+from aterm import lazy
+from aterm import exception
+from aterm import lexer
+from aterm import read
+from aterm import write
 from aterm import lists
 from aterm import annotation
 from aterm import path
@@ -317,6 +327,16 @@ class TestTerm(unittest.TestCase):
 			result = factory.make(patternStr, *args, **kargs)
 			self.failUnlessEqual(result, expectedResult)
 
+	def testPatternCache(self):
+		factory.matchCache.clear()
+		factory.buildCache.clear()
+		for i in range(3):
+			self.failUnless(factory.match('C(_,[*])', factory.parse('C(1,[2])')))
+			self.failIf(factory.match('C(_,[*])', factory.parse('D(1,[2])')))
+			self.failUnlessEqual(factory.make('C(_)', 1), factory.parse('C(1)'))
+		self.failUnlessEqual(len(factory.matchCache), 1)
+		self.failUnlessEqual(len(factory.buildCache), 1)
+
 	def _testHash(self, cmpf, hashf, msg = None):
 		for terms1Str in self.identityTestCases:
 			for term1Str in terms1Str:
@@ -362,6 +382,46 @@ class TestTerm(unittest.TestCase):
 			msg = 'python'
 		)
 
+	def testHashCache(self):
+		term = factory.parse('C(1,[D,"s"])')
+		self.failUnless(term._hash is None)
+		hash1 = hash(term)
+		self.failUnlessEqual(term._hash, hash1)
+		self.failUnlessEqual(term.args[1]._hash, hash(term.args[1]))
+		self.failUnlessEqual(hash(term), hash1)
+		self.failUnlessEqual(term.getHash(), hash1)
+
+		annotated = annotation.set(term, factory.parse('A(1)'))
+		self.failUnlessEqual(hash(annotated), hash1)
+		self.failIfEqual(annotated.getHash(), hash1)
+
+	def testHashLongList(self):
+		elms = [factory.makeInt(i) for i in range(100000)]
+		term1 = factory.makeList(elms)
+		term2 = factory.makeList(elms)
+		self.failUnlessEqual(hash(term1), hash(term2))
+		table = {term1: None}
+		self.failUnless(term1 in table)
+		self.failUnless(term2 in table)
+
+	def testCompareLongList(self):
+		elms = [factory.makeInt(i) for i in range(100000)]
+		term1 = factory.makeList(elms)
+		term2 = factory.makeList(elms[:-1] + [factory.makeInt(-1)])
+		self.failUnless(term1.isEquivalent(factory.makeList(elms)))
+		self.failUnless(term1.isEqual(factory.makeList(elms)))
+		self.failIf(term1.isEquivalent(term2))
+		self.failIf(term1.isEqual(term2))
+
+	def testCompareDeep(self):
+		term1 = factory.makeInt(0)
+		term2 = factory.makeInt(0)
+		for i in range(100000):
+			term1 = factory.makeAppl('C', [term1])
+			term2 = factory.makeAppl('C', [term2])
+		self.failUnlessEqual(hash(term1), hash(term2))
+		self.failUnless(term1.isEqual(term2))
+
 	def testAnnotations(self):
 		for terms1Str in self.identityTestCases:
 			for term1Str in terms1Str:
@@ -395,6 +455,60 @@ class TestTerm(unittest.TestCase):
 				self.failUnless(term.isEquivalent(term1))
 
 
+class TestSharing(unittest.TestCase):
+
+	sharingTestCases = [
+		'1',
+		'0.1',
+		'"s"',
+		'[]',
+		'[1,2]',
+		'C',
+		'C(1,[D,"s"])',
+		'C(1,2){A(1)}',
+		'(1,2)',
+	]
+
+	def setUp(self):
+		factory.setMaximalSharing(True)
+
+	def tearDown(self):
+		factory.setMaximalSharing(False)
+
+	def testIdentity(self):
+		for termStr in self.sharingTestCases:
+			term1 = factory.parse(termStr)
+			term2 = factory.readFromTextFile(StringIO(termStr))
+			self.failUnless(term1 is term2, termStr)
+
+	def testMake(self):
+		term1 = factory.makeAppl('C', [factory.makeInt(1), factory.makeList([factory.makeStr('s')])])
+		term2 = factory.make('C(_,[_])', 1, 's')
+		self.failUnless(term1 is term2)
+
+	def testEnable(self):
+		# patterns cached before sharing was enabled are not reused
+		factory.setMaximalSharing(False)
+		factory.make('C(1)')
+		factory.match('C(1)', factory.parse('C(1)'))
+		factory.setMaximalSharing(True)
+		term = factory.parse('C(1)')
+		self.failUnless(factory.make('C(1)') is term)
+		self.failUnless(factory.makeAppl('C', [factory.makeInt(1)]) is term)
+		self.failUnless(factory.match('C(1)', term))
+
+	def testDistinct(self):
+		self.failIf(factory.makeInt(1) is factory.makeReal(1.0))
+		self.failIf(factory.makeReal(0.0) is factory.makeReal(-0.0))
+		self.failIf(factory.parse('C(1)') is factory.parse('C(1){A}'))
+		self.failIf(factory.parse('[1]') is factory.parse('[1,2]'))
+
+	def testWeak(self):
+		import weakref
+		ref = weakref.ref(factory.makeAppl('C', [factory.makeInt(123456789)]))
+		self.failUnless(ref() is None)
+
+
 class TestList(unittest.TestCase):
 
 	splitTestCases = [
@@ -431,6 +545,342 @@ class TestList(unittest.TestCase):
 
 
 
+class TestArray(unittest.TestCase):
+
+	def setUp(self):
+		self.elms = [factory.makeInt(i) for i in range(20)]
+		self.array = factory.makeList(self.elms)
+		self.cons = factory.makeNil()
+		for elm in reversed(self.elms):
+			self.cons = factory.makeCons(elm, self.cons)
+
+	def testType(self):
+		self.failUnless(isinstance(self.array, term.Array))
+		self.failUnless(types.isCons(self.array))
+		self.failUnless(types.isList(self.array))
+		self.failUnless(factory.makeList(self.elms[:2]).elms is None)
+
+	def testEquality(self):
+		self.failUnlessEqual(self.array, self.cons)
+		self.failUnlessEqual(self.cons, self.array)
+		self.failUnlessEqual(hash(self.array), hash(self.cons))
+		self.failUnlessEqual(hash(self.array.tail), hash(self.cons.tail))
+		self.failUnlessEqual(str(self.array), str(self.cons))
+		self.failIfEqual(self.array, self.array.tail)
+		self.failIfEqual(self.array, self.cons.tail)
+
+	def testList(self):
+		self.failUnlessEqual(len(self.array), 20)
+		self.failUnlessEqual(list(self.array), self.elms)
+		self.failUnless(self.array.head is self.elms[0])
+		self.failUnless(self.array.tail is self.array.tail)
+		self.failUnlessEqual(len(self.array.tail), 19)
+		self.failUnlessEqual(len(factory.makeCons(self.elms[0], self.array)), 21)
+		for i in range(20):
+			self.failUnless(self.array[i] is self.elms[i])
+		self.failUnlessRaises(IndexError, lambda: self.array[20])
+
+		tail = self.array
+		for i in range(20):
+			tail = tail.tail
+		self.failUnless(types.isNil(tail))
+
+	def testSlice(self):
+		for start, stop in [(0, 20), (1, 20), (5, 10), (19, 20), (10, 5), (0, 30)]:
+			self.failUnlessEqual(list(self.array[start:stop]), self.elms[start:stop])
+			self.failUnlessEqual(self.array[start:stop], self.cons[start:stop])
+		self.failUnlessEqual(list(self.array[::2]), self.elms[::2])
+
+	def testMatch(self):
+		match = factory.match('[x,y,*z]', self.array)
+		self.failUnless(match)
+		self.failUnless(match.kargs['x'] is self.elms[0])
+		self.failUnlessEqual(match.kargs['z'], factory.makeList(self.elms[2:]))
+
+	def testLists(self):
+		self.failUnlessEqual(lists.reverse(self.array), lists.reverse(self.cons))
+		self.failUnlessEqual(lists.extend(self.array, self.array), lists.extend(self.cons, self.cons))
+		head, tail = lists.split(self.array, 5)
+		self.failUnlessEqual(head, self.cons[:5])
+		self.failUnlessEqual(tail, self.cons[5:])
+
+
+class TestCache(unittest.TestCase):
+
+	def testLRU(self):
+		lru = cache.LRUCache(3)
+		lru['a'] = 1
+		lru['b'] = 2
+		lru['c'] = 3
+		self.failUnlessEqual(lru['a'], 1)
+		lru['d'] = 4
+		self.failUnlessEqual(len(lru), 3)
+		self.failIf('b' in lru)
+		self.failUnless('a' in lru)
+		lru['c'] = 5
+		lru['e'] = 6
+		self.failIf('a' in lru)
+		self.failUnlessEqual(lru.get('c'), 5)
+		self.failUnlessEqual(lru.get('b'), None)
+		lru.clear()
+		self.failUnlessEqual(len(lru), 0)
+		lru['f'] = 7
+		self.failUnlessEqual(lru['f'], 7)
+
+	def testSize(self):
+		lru = cache.LRUCache(maxsize = 10, sizeof = lambda key, value: len(value))
+		lru['a'] = 'xxxx'
+		lru['b'] = 'xxxx'
+		self.failUnlessEqual(lru.size, 8)
+		lru['a']
+		lru['c'] = 'xxxx'
+		self.failUnlessEqual(len(lru), 2)
+		self.failIf('b' in lru)
+		lru['d'] = 'x'*11
+		self.failIf('d' in lru)
+		lru.resize(maxsize = 4)
+		self.failUnlessEqual(lru.size, 4)
+		self.failUnless('c' in lru)
+
+	def testLookup(self):
+		lru = cache.LRUCache(2)
+		lru['a'] = 1
+		self.failUnlessEqual(lru.lookup('a', lambda value: value == 1), 1)
+		self.failUnlessRaises(KeyError, lru.lookup, 'a', lambda value: value == 2)
+		self.failUnlessRaises(KeyError, lru.lookup, 'b')
+		self.failUnlessEqual(lru.hits, 1)
+		self.failUnlessEqual(lru.misses, 2)
+		self.failUnless('a' in lru)
+
+	def testResize(self):
+		lru = cache.LRUCache(3, 10, lambda key, value: len(value))
+		lru.resize(maxlen = 5)
+		self.failUnlessEqual(lru.maxlen, 5)
+		self.failUnlessEqual(lru.maxsize, 10)
+		lru.resize(maxsize = None)
+		self.failUnlessEqual(lru.maxlen, 5)
+		self.failUnless(lru.maxsize is None)
+
+	def testStats(self):
+		lru = cache.LRUCache(2)
+		lru['a'] = 1
+		lru['b'] = 2
+		lru['a']
+		lru.get('c')
+		lru['c'] = 3
+		stats = lru.stats()
+		self.failUnlessEqual(stats['hits'], 1)
+		self.failUnlessEqual(stats['misses'], 1)
+		self.failUnlessEqual(stats['evictions'], 1)
+		self.failUnlessEqual(stats['entries'], 2)
+		self.failUnlessAlmostEqual(stats['ratio'], 0.5)
+
+	def testParseCache(self):
+		factory.parseCache.clear()
+		factory.parseCache.resetStats()
+		term1 = factory.parse('C(1)')
+		term2 = factory.parse('C(1)')
+		self.failUnless(term1 is term2)
+		stats = factory.getCacheStats()['parse']
+		self.failUnlessEqual(stats['hits'], 1)
+		self.failUnlessEqual(stats['misses'], 1)
+
+
+class TestRead(unittest.TestCase):
+
+	testCases = [
+		'1', '-1', '0.5', '1e3', '-.5', '1.', '"s"', '"a\\nb\\\\c\\"d"',
+		'[]', '[1,2]', '[1,2,]', '[ 1 , ]', '[1,2,3,4,5,6,7,8,9,10]',
+		'C', 'C()', 'C (1)', 'C{A}', 'C(){}', 'C{A,}', 'C { } ', '()', '(1)', '(1,2){A}',
+		'C(1,[2,3,[4]],"s",0.5){X(1),Y}', 'C\n(\n1\n)\n{\nA\n}\n',
+		# trailing tokens are ignored, as long as they are valid
+		'C(1) x', 'C(1)(2)', '[1]{A}',
+	]
+
+	errorTestCases = [
+		'', ' ', 'x', '_', '[,]', '[1,*]', '[1 2]', '[*]', 'C(1,)', 'C(', 'C(x)',
+		'C([1]{A})', 'C(1) $', '"unterminated', ')',
+	]
+
+	def parseAntlr(self, buf):
+		return factory._parse(lexer.Lexer(buf))
+
+	def testParse(self):
+		for termStr in self.testCases:
+			term1 = read.parse(factory, termStr)
+			term2 = self.parseAntlr(termStr)
+			self.failUnless(term1.isEqual(term2), "%r != %r" % (term1, term2))
+
+	def testErrors(self):
+		for termStr in self.errorTestCases:
+			self.failUnlessRaises(exception.ParseError, read.parse, factory, termStr)
+
+	def testDeep(self):
+		termStr = 'C(' * 10000 + '1' + ')' * 10000
+		term = read.parse(factory, termStr)
+		for i in range(10000):
+			self.failUnlessEqual(term.name, 'C')
+			term, = term.args
+		self.failUnlessEqual(term.value, 1)
+
+	def testWriteDeep(self):
+		termStr = 'C(' * 10000 + '1' + ')' * 10000
+		term = read.parse(factory, termStr)
+		self.failUnlessEqual(str(term), termStr)
+
+	def testIterText(self):
+		chunks = list(write.iterText(factory.parse('C(1,[2,3],"s"){A}'), 2))
+		self.failUnlessEqual(chunks, ['C(', '1,[', '2,3', '],"s"', '){A', '}'])
+		for termStr in self.testCases:
+			term = factory.parse(termStr)
+			chunks = list(write.iterText(term, 2))
+			self.failUnlessEqual(''.join(chunks), str(term))
+			fp = StringIO()
+			writer = write.TextWriter(fp)
+			writer.visit(term)
+			self.failUnlessEqual(fp.getvalue(), str(term))
+
+	def testWriteTextList(self):
+		terms = [factory.parse(termStr) for termStr in self.testCases]
+		fp = StringIO()
+		write.writeTextList(iter(terms), fp)
+		self.failUnlessEqual(fp.getvalue(), str(factory.makeList(terms)))
+		fp = StringIO()
+		write.writeTextList(iter([]), fp, '{', '}')
+		self.failUnlessEqual(fp.getvalue(), '{}')
+
+	def testReadFromTextFile(self):
+		fp = StringIO('C(1,[2,3],"s"){A}')
+		term = factory.readFromTextFile(fp)
+		self.failUnlessEqual(str(term), 'C(1,[2,3],"s"){A}')
+
+
+class TestBinary(unittest.TestCase):
+
+	def roundTrip(self, term1):
+		fp = StringIO()
+		term1.writeToBinaryFile(fp)
+		fp.seek(0)
+		self.failUnless(binary.isBinaryFile(fp))
+		term2 = factory.readFromBinaryFile(fp)
+		self.failUnless(term1.isEqual(term2), "%r != %r" % (term1, term2))
+		return fp.getvalue(), term2
+
+	testCases = [
+		'0', '1', '-1', '127', '128', '-128', '123456789012345678901234567890',
+		'0.0', '0.5', '-1.25e10',
+		'""', '"s"', '"a\\nb\\"c"',
+		'[]', '[1]', '[1,2,3]', '[[],[[]]]',
+		'C', 'C(1)', 'C(1,"s",[2])', '()', '(1,2)',
+		'C{A}', 'C(D{1}){A,B(2)}', '[C{A},C]',
+	]
+
+	def testRoundTrip(self):
+		for termStr in self.testCases:
+			self.roundTrip(factory.parse(termStr))
+
+	def testLongList(self):
+		term1 = factory.makeList([factory.makeInt(i) for i in range(1000)])
+		self.roundTrip(term1)
+		term1 = factory.makeNil()
+		for i in range(1000):
+			term1 = factory.makeCons(factory.makeInt(i), term1)
+		self.roundTrip(term1)
+
+	def testDeep(self):
+		term1 = factory.makeNil()
+		for i in range(10000):
+			term1 = factory.makeAppl('C', [term1])
+		self.roundTrip(term1)
+
+	def testSharing(self):
+		term1 = factory.makeList([factory.parse('Sym("eax"){Reg}')])
+		term2 = factory.makeList([factory.makeAppl('Sym', [factory.makeStr('eax')], factory.parse('[Reg]')) for i in range(100)])
+		buf1, term3 = self.roundTrip(term1)
+		buf2, term4 = self.roundTrip(term2)
+		self.failUnless(len(buf2) < len(buf1) + 200)
+		self.failUnless(term4[0] is term4[99])
+
+	def testSharedTail(self):
+		tail = factory.parse('[3,4,5]')
+		term1 = factory.makeList([
+			tail,
+			factory.makeCons(factory.makeInt(1), tail),
+			factory.makeCons(factory.makeInt(2), tail),
+		])
+		buf, term2 = self.roundTrip(term1)
+		self.failUnless(term2[1].tail is term2[0])
+		self.failUnless(term2[2].tail is term2[0])
+
+	def testStream(self):
+		fp = StringIO()
+		writer = binary.BinaryWriter(fp)
+		root = writer.write(factory.parse('C([1,2,3])'))
+		self.failUnlessEqual(writer.write(factory.parse('[1,2,3]')), root - 1)
+		writer.close(root)
+		fp.seek(0)
+		self.failUnlessEqual(str(factory.readFromBinaryFile(fp)), 'C([1,2,3])')
+
+	def testErrors(self):
+		for buf in ['', 'C(1)', binary.MAGIC, binary.MAGIC + '\x05\x00\x01', binary.MAGIC + '\xff']:
+			fp = StringIO(buf)
+			self.failUnlessEqual(binary.isBinaryFile(fp), buf.startswith(binary.MAGIC))
+			self.failUnlessRaises(exception.ParseError, factory.readFromBinaryFile, fp)
+
+
+class TestLazy(unittest.TestCase):
+
+	def load(self, term, index = True):
+		fp = tempfile.TemporaryFile()
+		term.writeToBinaryFile(fp, index)
+		fp.flush()
+		fp.seek(0)
+		return lazy.Loader(factory, fp)
+
+	testCases = TestBinary.testCases + [
+		'C(1,[2,3,4,5,6,7,8,9,10,11],"s"){A,B(0.5)}',
+		'[C{A},C,(1,[]),[[]]]',
+	]
+
+	def testLoad(self):
+		for termStr in self.testCases:
+			term1 = factory.parse(termStr)
+			term2 = self.load(term1).getRoot()
+			self.failUnless(term1.isEqual(term2), "%r != %r" % (term1, term2))
+			self.failUnlessEqual(str(term2), str(term1))
+
+	def testLazy(self):
+		term1 = factory.makeAppl('Module', [factory.makeList([
+			factory.parse('Function(Void,"f%d",[],[Ret(Void,NoExpr)])' % i) for i in range(100)
+		])])
+		loader = self.load(term1)
+		term2 = loader.getRoot()
+		self.failUnlessEqual(len(loader.termCache), 1)
+		function = term2.args[0][50]
+		self.failUnlessEqual(function.name, 'Function')
+		self.failUnless(len(loader.termCache) < 110)
+		self.failUnlessEqual(function.args[1].value, 'f50')
+		self.failUnless(function is loader.getRoot().args[0][50])
+
+	def testReadFromBinaryFile(self):
+		fp = tempfile.TemporaryFile()
+		factory.parse('C(1,[2]){A}').writeToBinaryFile(fp, True)
+		fp.flush()
+		fp.seek(0)
+		term = factory.readFromBinaryFile(fp, lazy = True)
+		self.failUnlessEqual(str(term), 'C(1,[2]){A}')
+		fp.seek(0)
+		term = factory.readFromBinaryFile(fp)
+		self.failUnlessEqual(str(term), 'C(1,[2]){A}')
+
+	def testErrors(self):
+		self.failUnlessRaises(exception.ParseError, self.load, factory.parse('C'), False)
+		fp = tempfile.TemporaryFile()
+		fp.write('C(1)' * 16)
+		fp.flush()
+		self.failUnlessRaises(exception.ParseError, lazy.Loader, factory, fp)
+
+
 class TestPath(unittest.TestCase):
 
 	testCompareTestCases = [
@@ -513,6 +963,27 @@ class TestPath(unittest.TestCase):
 			result = path_.transform(term, func)
 			self.failUnlessEqual(result, expectedResult, '%s . %s == %s (!= %s)' % (termStr, pathStr, result, expectedResult))
 
+	def testIndex(self):
+		func = lambda x: x.factory.make('X(_)', x)
+		for termStr, pathStr, expectedResultStr in self.projectTestCases:
+			term = factory.parse(termStr)
+			path_ = path.Path.fromStr(pathStr)
+			index = path.index(term)
+			result = index.project(path_)
+			self.failUnless(result is path_.project(term))
+		for termStr, pathStr, expectedResultStr in self.transformTestCases:
+			term = factory.parse(termStr)
+			path_ = path.Path.fromStr(pathStr)
+			expectedResult = factory.parse(expectedResultStr)
+			result = path.index(term).transform(path_, func)
+			self.failUnlessEqual(result, expectedResult, '%s . %s == %s (!= %s)' % (termStr, pathStr, result, expectedResult))
+		# long lists
+		term = factory.makeList([factory.makeInt(i) for i in range(20)])
+		path_ = path.Path([13])
+		self.failUnlessEqual(path.index(term).project(path_), factory.makeInt(13))
+		result = path.index(term).transform(path_, func)
+		self.failUnlessEqual(result, path_.transform(term, func))
+
 	annotateTestCases = [
 		('A', 'A{Path([])}'),
 		('[A,B]', '[A{Path([0])},B{Path([1])}]'),
@@ -530,6 +1001,36 @@ class TestPath(unittest.TestCase):
 			result = path.annotate(term)
 			self.failUnlessEqual(result, expectedResult)
 
+	reannotateTestCases = [
+		('C(A,B)', 'C(A,B)'),
+		('C(A,B)', 'C(A,D)'),
+		('C(C(A),C(B))', 'C(C(A),C(B),C(D))'),
+		('C(C(A),C(B))', 'C(C(B),C(A))'),
+		('C(C(A),[C(B),C(C)])', 'C(C(A),[C(B)])'),
+		('C(C(A),[C(B)])', 'C(C(A),[D,C(B)])'),
+		('[C(A),C(B)]', 'D(C(A),C(B))'),
+	]
+
+	def testReannotate(self):
+		for oldStr, termStr in self.reannotateTestCases:
+			previous = path.annotate(factory.parse(oldStr))
+			term = factory.parse(termStr)
+			# graft the unchanged subterms of the previous term
+			if term.type == types.APPL and previous.type == types.APPL:
+				args = list(term.args)
+				for index in range(min(len(args), len(previous.args))):
+					if previous.args[index].isEquivalent(args[index]):
+						args[index] = previous.args[index]
+				term = factory.makeAppl(term.name, args)
+			expectedResult = path.annotate(term)
+			result = path.annotate(term, previous = previous)
+			self.failUnless(expectedResult.isEqual(result), msg = "%s -> %s (!= %s)" % (term, result, expectedResult))
+			if term.type == types.APPL and previous.type == types.APPL:
+				# the grafted subterms are reused
+				for arg, resultArg, oldArg in zip(term.args, result.args, previous.args):
+					if arg is oldArg:
+						self.failUnless(resultArg is arg)
+
 	def testDeAnnotate(self):
 		for expectedResultStr, termStr in self.annotateTestCases:
 			term = factory.parse(termStr)
@@ -0,0 +1,420 @@
+'''Binary term reading and writing.
+
+Terms are serialized as a stream of node records, in post-order, so that a
+record only ever refers to previously written records. Lists are written as
+a single record holding all the elements up to a tail which was already
+written. Every node record is assigned a sequential node number, which is
+how records refer to each other.
+Subterms are shared: a subterm which occurs several times in a term -- either
+because it is the same object or because it is structurally equal, including
+the annotations -- is written only once.
+
+The stream layout is::
+
+	stream  := MAGIC record* END root [index]
+	record  := SYMBOL len bytes      (defines the next symbol number)
+	         | INT zigzag
+	         | REAL float64
+	         | STR len bytes
+	         | NIL
+	         | LIST n node{n} tail
+	         | APPL symbol n node{n}
+	         | ANNOS symbol n node{n} annos
+
+where all numbers are encoded as little-endian base 128 varints. Symbol
+definitions do not take a node number.
+
+The stream may optionally be followed by an index, which allows random
+access to the records (see L{aterm.lazy})::
+
+	index   := offset{nodes} offset{symbols} offset nodes symbols root INDEX_MAGIC
+
+where each number is a little-endian 64 bit unsigned integer, the offsets
+being relative to the start of the stream. Readers which do not need the
+index stop at the END record.
+'''
+
+
+import struct
+
+from aterm import types
+from aterm import exception
+
+
+MAGIC = '\x00ATB\x01'
+
+INDEX_MAGIC = '\x00ATI\x01'
+
+# index trailer: index offset, number of nodes, number of symbols and root
+# node number
+INDEX_FOOTER = '<QQQQ'
+
+END = 0
+SYMBOL = 1
+INT = 2
+REAL = 3
+STR = 4
+NIL = 5
+LIST = 6
+APPL = 7
+ANNOS = 8
+
+# size of the I/O buffers
+CHUNK_SIZE = 64*1024
+
+
+def _encodeVarint(value):
+	'''Encode a non-negative integer as a varint.'''
+	if value < 0x80:
+		return chr(value)
+	bytes = []
+	while value >= 0x80:
+		bytes.append(chr((value & 0x7f) | 0x80))
+		value >>= 7
+	bytes.append(chr(value))
+	return ''.join(bytes)
+
+
+def _encodeZigzag(value):
+	'''Encode a signed integer as a varint.'''
+	if value >= 0:
+		return _encodeVarint(value << 1)
+	else:
+		return _encodeVarint(((-value) << 1) - 1)
+
+
+def decodeVarint(buf, pos):
+	'''Decode a varint from a buffer at the given position, returning the
+	value and the position after it.'''
+	byte = ord(buf[pos])
+	pos += 1
+	result = byte & 0x7f
+	shift = 7
+	while byte & 0x80:
+		byte = ord(buf[pos])
+		pos += 1
+		result |= (byte & 0x7f) << shift
+		shift += 7
+	return result, pos
+
+
+def decodeZigzag(value):
+	'''Decode a signed integer from its zigzag encoding.'''
+	if value & 1:
+		return -((value + 1) >> 1)
+	else:
+		return value >> 1
+
+
+class BinaryWriter(object):
+	'''Writes terms to a binary stream.
+
+	Several terms can be written to the same stream with L{write}, in which
+	case the subterms shared between them are written only once. The stream
+	must be terminated with L{close}. If index is true, an index of the
+	records is written at the end.
+	'''
+
+	def __init__(self, fp, index = False):
+		self.fp = fp
+		self.buf = [MAGIC]
+		self.buflen = len(MAGIC)
+		# stream offset of the buffered data
+		self.offset = 0
+		self.nodes = 0
+		if index:
+			self.nodeOffsets = []
+			self.symbolOffsets = []
+		else:
+			self.nodeOffsets = None
+			self.symbolOffsets = None
+		# node numbers of the written terms, by identity
+		self.ids = {}
+		# node numbers of the written terms, by structure
+		self.keys = {}
+		# symbol numbers
+		self.symbols = {}
+		# keep the written terms alive, so that their identities stay valid
+		self.terms = []
+
+	def _emit(self, record):
+		self.buf.append(record)
+		self.buflen += len(record)
+		if self.buflen >= CHUNK_SIZE:
+			self.flush()
+
+	def _node(self, term, key, record):
+		'''Emit a node record, unless an equal one was emitted before.'''
+		try:
+			node = self.keys[key]
+		except KeyError:
+			node = self.nodes
+			self.nodes += 1
+			self.keys[key] = node
+			if self.nodeOffsets is not None:
+				self.nodeOffsets.append(self.offset + self.buflen)
+			self._emit(record)
+		self.ids[id(term)] = node
+		self.terms.append(term)
+		return node
+
+	def _symbol(self, name):
+		try:
+			return self.symbols[name]
+		except KeyError:
+			symbol = len(self.symbols)
+			self.symbols[name] = symbol
+			if self.symbolOffsets is not None:
+				self.symbolOffsets.append(self.offset + self.buflen)
+			self._emit(chr(SYMBOL) + _encodeVarint(len(name)) + name)
+			return symbol
+
+	def _refs(self, nodes):
+		return ''.join([_encodeVarint(node) for node in nodes])
+
+	def write(self, term):
+		'''Write a term, returning its node number.'''
+
+		ids = self.ids
+		try:
+			return ids[id(term)]
+		except KeyError:
+			pass
+
+		stack = [term]
+		push = stack.append
+		pop = stack.pop
+		while stack:
+			# post-order traversal: a term is only written after all its subterms
+			current = stack[-1]
+			if id(current) in ids:
+				pop()
+				continue
+			type = current.type
+			if type == types.INT:
+				value = current.value
+				self._node(current, (INT, value), chr(INT) + _encodeZigzag(value))
+				pop()
+			elif type == types.REAL:
+				value = current.value
+				record = struct.pack('<d', value)
+				self._node(current, (REAL, record), chr(REAL) + record)
+				pop()
+			elif type == types.STR:
+				value = str(current.value)
+				self._node(current, (STR, value), chr(STR) + _encodeVarint(len(value)) + value)
+				pop()
+			elif type == types.NIL:
+				self._node(current, (NIL,), chr(NIL))
+				pop()
+			elif type == types.CONS:
+				# collect the elements up to an already written tail
+				elms = []
+				tail = current
+				while tail.type == types.CONS and id(tail) not in ids:
+					if tail.elms is not None:
+						elms.extend(tail.getElms())
+						tail = current.factory.makeNil()
+						break
+					elms.append(tail.head)
+					tail = tail.tail
+				pending = False
+				if id(tail) not in ids:
+					push(tail)
+					pending = True
+				for elm in reversed(elms):
+					if id(elm) not in ids:
+						push(elm)
+						pending = True
+				if pending:
+					continue
+				refs = [ids[id(elm)] for elm in elms]
+				refs.append(ids[id(tail)])
+				key = (LIST,) + tuple(refs)
+				record = chr(LIST) + _encodeVarint(len(elms)) + self._refs(refs)
+				self._node(current, key, record)
+				pop()
+			elif type == types.APPL:
+				args = current.args
+				annos = current.annotations
+				pending = False
+				if annos and id(annos) not in ids:
+					push(annos)
+					pending = True
+				for arg in reversed(args):
+					if id(arg) not in ids:
+						push(arg)
+						pending = True
+				if pending:
+					continue
+				symbol = self._symbol(current.name)
+				refs = [ids[id(arg)] for arg in args]
+				if annos:
+					refs.append(ids[id(annos)])
+					tag = ANNOS
+				else:
+					tag = APPL
+				key = (tag, symbol) + tuple(refs)
+				record = chr(tag) + _encodeVarint(symbol) + _encodeVarint(len(args)) + self._refs(refs)
+				self._node(current, key, record)
+				pop()
+			else:
+				raise TypeError('unexpected term type %r' % type)
+
+		return ids[id(term)]
+
+	def flush(self):
+		'''Write the buffered records to the stream.'''
+		self.fp.write(''.join(self.buf))
+		self.offset += self.buflen
+		self.buf = []
+		self.buflen = 0
+
+	def _emitOffsets(self, offsets):
+		for start in xrange(0, len(offsets), 1024):
+			chunk = offsets[start:start + 1024]
+			self._emit(struct.pack('<%dQ' % len(chunk), *chunk))
+
+	def close(self, root):
+		'''Terminate the stream, designating the root node number.'''
+		self._emit(chr(END) + _encodeVarint(root))
+		if self.nodeOffsets is not None:
+			indexOffset = self.offset + self.buflen
+			self._emitOffsets(self.nodeOffsets)
+			self._emitOffsets(self.symbolOffsets)
+			self._emit(struct.pack(INDEX_FOOTER, indexOffset, self.nodes, len(self.symbols), root) + INDEX_MAGIC)
+			self.nodeOffsets = None
+			self.symbolOffsets = None
+		self.flush()
+		self.ids = None
+		self.keys = None
+		self.terms = None
+
+
+def writeToBinaryFile(term, fp, index = False):
+	'''Write a term to a binary file object, optionally indexed.'''
+	writer = BinaryWriter(fp, index)
+	root = writer.write(term)
+	writer.close(root)
+
+
+class BinaryReader(object):
+	'''Reads terms from a binary stream.'''
+
+	def __init__(self, factory, fp):
+		self.factory = factory
+		self.fp = fp
+		self.buf = ''
+		self.pos = 0
+
+	def _fill(self, size):
+		'''Ensure at least size bytes are buffered.'''
+		buf = self.buf[self.pos:]
+		while len(buf) < size:
+			data = self.fp.read(max(size - len(buf), CHUNK_SIZE))
+			if not data:
+				raise exception.ParseError('unexpected end of binary term stream')
+			buf += data
+		self.buf = buf
+		self.pos = 0
+
+	def _read(self, size):
+		if self.pos + size > len(self.buf):
+			self._fill(size)
+		pos = self.pos
+		self.pos = pos + size
+		return self.buf[pos:pos + size]
+
+	def _byte(self):
+		if self.pos >= len(self.buf):
+			self._fill(1)
+		pos = self.pos
+		self.pos = pos + 1
+		return ord(self.buf[pos])
+
+	def _varint(self):
+		result = 0
+		shift = 0
+		byte = self._byte()
+		while byte & 0x80:
+			result |= (byte & 0x7f) << shift
+			shift += 7
+			byte = self._byte()
+		return result | (byte << shift)
+
+	def _zigzag(self):
+		return decodeZigzag(self._varint())
+
+	def _refs(self, nodes, n):
+		varint = self._varint
+		try:
+			return [nodes[varint()] for i in xrange(n)]
+		except IndexError:
+			raise exception.ParseError('invalid node reference in binary term stream')
+
+	def read(self):
+		'''Read a term.'''
+
+		if self._read(len(MAGIC)) != MAGIC:
+			raise exception.ParseError('not a binary term stream')
+
+		factory = self.factory
+		nodes = []
+		append = nodes.append
+		symbols = []
+		while True:
+			tag = self._byte()
+			if tag == INT:
+				append(factory.makeInt(self._zigzag()))
+			elif tag == REAL:
+				append(factory.makeReal(struct.unpack('<d', self._read(8))[0]))
+			elif tag == STR:
+				append(factory.makeStr(self._read(self._varint())))
+			elif tag == NIL:
+				append(factory.makeNil())
+			elif tag == LIST:
+				n = self._varint()
+				elms = self._refs(nodes, n + 1)
+				tail = elms.pop()
+				if tail.type == types.NIL:
+					term = factory.makeList(elms)
+				else:
+					term = tail
+					for elm in reversed(elms):
+						term = factory.makeCons(elm, term)
+				append(term)
+			elif tag == APPL or tag == ANNOS:
+				try:
+					name = symbols[self._varint()]
+				except IndexError:
+					raise exception.ParseError('invalid symbol reference in binary term stream')
+				n = self._varint()
+				if tag == ANNOS:
+					args = self._refs(nodes, n + 1)
+					annos = args.pop()
+				else:
+					args = self._refs(nodes, n)
+					annos = None
+				append(factory.makeAppl(name, args, annos))
+			elif tag == SYMBOL:
+				symbols.append(self._read(self._varint()))
+			elif tag == END:
+				return self._refs(nodes, 1)[0]
+			else:
+				raise exception.ParseError('invalid record %r in binary term stream' % tag)
+
+
+def isBinaryFile(fp):
+	'''Check whether a seekable file object holds a binary term stream,
+	leaving the file position unchanged.'''
+	pos = fp.tell()
+	try:
+		return fp.read(len(MAGIC)) == MAGIC
+	finally:
+		fp.seek(pos)
+
+
+def readFromBinaryFile(factory, fp):
+	'''Read a term from a binary file object.'''
+	reader = BinaryReader(factory, fp)
+	return reader.read()
@@ -0,0 +1,157 @@
+'''Term caches.'''
+
+
+# link fields
+_PREV, _NEXT, _KEY, _VALUE, _SIZE = range(5)
+
+# default of the limits left unchanged
+_unchanged = object()
+
+
+class LRUCache(object):
+	'''Mapping which holds a bounded number of entries, discarding the least
+	recently used entries when full.
+
+	The cache can be bounded both in number of entries and in total size. The
+	size of each entry is estimated by the supplied C{sizeof} function, which
+	takes the key and value as arguments and should return an approximate
+	size in bytes.
+
+	Hits, misses and evictions are counted, and reported by L{stats}.
+	'''
+
+	def __init__(self, maxlen = None, maxsize = None, sizeof = None):
+		self.maxlen = maxlen
+		self.maxsize = maxsize
+		self.sizeof = sizeof
+		self.table = {}
+		self.size = 0
+		# circular doubly linked list of [prev, next, key, value, size] links,
+		# from the most to the least recently used entry
+		self.root = root = []
+		root[:] = [root, root, None, None, 0]
+		self.resetStats()
+
+	def __len__(self):
+		return len(self.table)
+
+	def __contains__(self, key):
+		return key in self.table
+
+	def lookup(self, key, valid = None):
+		'''Return the value of a key, raising KeyError if not found.
+
+		When given, the C{valid} function is called with the value found, and
+		if it returns false the entry is taken as stale: the lookup counts as
+		a miss and raises KeyError, leaving the entry to be replaced.
+		'''
+		try:
+			link = self.table[key]
+		except KeyError:
+			self.misses += 1
+			raise
+		if valid is not None and not valid(link[_VALUE]):
+			self.misses += 1
+			raise KeyError(key)
+		self.hits += 1
+		root = self.root
+		if root[_NEXT] is not link:
+			# move the link to the front
+			prev, next = link[_PREV], link[_NEXT]
+			prev[_NEXT] = next
+			next[_PREV] = prev
+			first = root[_NEXT]
+			link[_PREV] = root
+			link[_NEXT] = first
+			first[_PREV] = link
+			root[_NEXT] = link
+		return link[_VALUE]
+
+	__getitem__ = lookup
+
+	def get(self, key, default = None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+
+	def __setitem__(self, key, value):
+		if key in self.table:
+			self._remove(self.table[key])
+		if self.sizeof is None:
+			size = 0
+		else:
+			size = self.sizeof(key, value)
+			if self.maxsize is not None and size > self.maxsize:
+				# entry would never fit
+				return
+		root = self.root
+		first = root[_NEXT]
+		link = [root, first, key, value, size]
+		first[_PREV] = link
+		root[_NEXT] = link
+		self.table[key] = link
+		self.size += size
+		self._shrink()
+
+	def __delitem__(self, key):
+		self._remove(self.table[key])
+
+	def _remove(self, link):
+		prev, next = link[_PREV], link[_NEXT]
+		prev[_NEXT] = next
+		next[_PREV] = prev
+		del self.table[link[_KEY]]
+		self.size -= link[_SIZE]
+
+	def _shrink(self):
+		'''Discard the least recently used entries until within limits.'''
+		root = self.root
+		maxlen = self.maxlen
+		maxsize = self.maxsize
+		while self.table and (
+			(maxlen is not None and len(self.table) > maxlen) or
+			(maxsize is not None and self.size > maxsize)
+		):
+			self._remove(root[_PREV])
+			self.evictions += 1
+
+	def resize(self, maxlen = _unchanged, maxsize = _unchanged):
+		'''Change the cache limits, discarding entries as necessary. Limits
+		which are not given are left unchanged, and None stands for no
+		limit.'''
+		if maxlen is not _unchanged:
+			self.maxlen = maxlen
+		if maxsize is not _unchanged:
+			self.maxsize = maxsize
+		self._shrink()
+
+	def clear(self):
+		self.table.clear()
+		self.size = 0
+		root = self.root
+		root[:] = [root, root, None, None, 0]
+
+	def resetStats(self):
+		'''Reset the hit, miss and eviction counters.'''
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def stats(self):
+		'''Return a dictionary with the cache statistics.'''
+		lookups = self.hits + self.misses
+		if lookups:
+			ratio = float(self.hits)/lookups
+		else:
+			ratio = 0.0
+		return {
+			'entries': len(self.table),
+			'size': self.size,
+			'maxlen': self.maxlen,
+			'maxsize': self.maxsize,
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'ratio': ratio,
+		}
@@ -2,75 +2,71 @@
 
 
 from aterm import types
-from aterm import visitor
 
 
-class _Comparator(visitor.Visitor):
-	'''Base class for term comparators.'''
+def _compare(term, other, annos):
+	'''Compare two terms, optionally considering annotations.
 
-	def visitTerm(self, term):
-		assert False
-
-	def visitLit(self, term, other):
-		return \
-			term.type == other.type and \
-			term.value == other.value
-
-	def visitNil(self, term, other):
-		return \
-			types.NIL == other.type
-
-	def visitCons(self, term, other):
-		return \
-			types.CONS == other.type and \
-			self.visit(term.head, other.head) and \
-			self.visit(term.tail, other.tail)
-
-	def visitAppl(self, term, other):
-		if types.APPL != other.type:
-			return False
-		if term.name != other.name:
-			return False
-		if len(term.args) != len(other.args):
-			return False
-		for term_arg, other_arg in zip(term.args, other.args):
-			if not self.visit(term_arg, other_arg):
+	Terms are traversed with an explicit stack, so that arbitrarily deep or
+	long terms can be compared. Identical subterms are not walked, and
+	subterms whose cached hashes differ are rejected without being walked.
+	'''
+	stack = [(term, other)]
+	push = stack.append
+	pop = stack.pop
+	while stack:
+		term, other = pop()
+		while term is not other:
+			type = term.type
+			if type != other.type:
 				return False
-		return True
-
+			term_hash = term._hash
+			if term_hash is not None:
+				other_hash = other._hash
+				if other_hash is not None and term_hash != other_hash:
+					return False
+			if type & types.LIT:
+				if term.value != other.value:
+					return False
+				break
+			elif type == types.NIL:
+				break
+			elif type == types.CONS and term.elms is not None and other.elms is not None:
+				if len(term) != len(other):
+					return False
+				pairs = zip(term.getElms(), other.getElms())
+				pairs.reverse()
+				stack.extend(pairs)
+				break
+			elif type == types.CONS:
+				# follow the tail without growing the stack
+				push((term.head, other.head))
+				term = term.tail
+				other = other.tail
+			elif type == types.APPL:
+				if term.name != other.name:
+					return False
+				term_args = term.args
+				other_args = other.args
+				if len(term_args) != len(other_args):
+					return False
+				if annos:
+					push((term.annotations, other.annotations))
+				pairs = zip(term_args, other_args)
+				pairs.reverse()
+				stack.extend(pairs)
+				break
+			else:
+				raise TypeError('not a term', term)
+	return True
 
-class _EquivalenceComparator(_Comparator):
-	'''Comparator for determining term equivalence, which does not
-	consider annotations.'''
-
-	def visit(self, term, other):
-		return \
-			term is other or \
-			_Comparator.visit(self, term, other)
 
 def isEquivalent(term, other):
 	'''Determines if two terms are equivalent, i.e., equal except for the
 	annotations.'''
-	comparator = _EquivalenceComparator()
-	return comparator.visit(term, other)
-
-
-class _EqualityComparator(_EquivalenceComparator):
-	'''Comparator for determining term equality, which considers annotations.
-	'''
-
-	def compareAnnos(self, terms, others):
-		if terms is None:
-			return others is None
-		else:
-			return others is not None and self.visit(terms, others)
+	return _compare(term, other, False)
 
-	def visitAppl(self, term, other):
-		return \
-			_EquivalenceComparator.visitAppl(self, term, other) and \
-			self.compareAnnos(term.annotations, other.annotations)
 
 def isEqual(term, other):
 	'''Determines if two terms are equal (including annotations).'''
-	comparator = _EqualityComparator()
-	return comparator.visit(term, other)
+	return _compare(term, other, True)
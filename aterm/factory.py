@@ -1,9 +1,16 @@
 '''Term creation.'''
 
 
+import weakref
+
 import antlr
 
 from aterm import exception
+from aterm import types
+from aterm import cache
+from aterm import binary
+from aterm import read
+from aterm import lazy as _lazy
 from aterm import term
 from aterm import lexer
 from aterm import parser
@@ -24,32 +31,88 @@ class _Singleton(type):
 		return mcs.__instance
 
 
+def _sizeofParse(buf, term):
+	'''Rough estimate of the memory taken by a parsed term, based on the
+	length of its textual representation.'''
+	return 64 + 16*len(buf)
+
+
 class Factory(object):
 	'''This class is responsible for make new terms, either by parsing
 	from strings or streams, or via one the of the "make" methods.'''
 
 	__metaclass__ = _Singleton
 
-	# TODO: implement maximal sharing
-
 	MAX_PARSE_CACHE_LEN = 512
 
-	# TODO: cache match and build patterns too
+	# approximate size limit of the parse cache, in bytes
+	MAX_PARSE_CACHE_SIZE = None
+
+	MAX_PATTERN_CACHE_LEN = 512
+
+	# minimum length of the lists which are backed by arrays
+	MIN_ARRAY_LEN = 8
 
 	def __init__(self):
-		self.parseCache = {}
+		self.parseCache = cache.LRUCache(
+			self.MAX_PARSE_CACHE_LEN,
+			self.MAX_PARSE_CACHE_SIZE,
+			_sizeofParse,
+		)
+		self.matchCache = cache.LRUCache(self.MAX_PATTERN_CACHE_LEN)
+		self.buildCache = cache.LRUCache(self.MAX_PATTERN_CACHE_LEN)
 		self.__nil = term.Nil(self)
+		self.sharing = False
+		self.__shared = weakref.WeakValueDictionary()
+
+	def setMaximalSharing(self, sharing = True):
+		'''Enables or disables maximal sharing.
+
+		When maximal sharing is enabled, structurally equal terms created by
+		this factory are the same object. Shared terms are only weakly
+		referenced by the factory, so they are discarded as soon as they are
+		no longer in use elsewhere.
+		'''
+		sharing = bool(sharing)
+		if sharing and not self.sharing:
+			# cached terms and the constant subterms of cached patterns were
+			# not created with sharing
+			self.parseCache.clear()
+			self.matchCache.clear()
+			self.buildCache.clear()
+		self.sharing = sharing
+
+	def getMaximalSharing(self):
+		'''Whether maximal sharing is enabled.'''
+		return self.sharing
+
+	def _share(self, key, cls, *args):
+		'''Lookup a shared term, creating it if not found.'''
+		shared = self.__shared
+		try:
+			return shared[key]
+		except KeyError:
+			result = cls(self, *args)
+			shared[key] = result
+			return result
 
 	def makeInt(self, value):
 		'''Creates a new integer literal term'''
+		if self.sharing:
+			return self._share((types.INT, value), term.Integer, value)
 		return term.Integer(self, value)
 
 	def makeReal(self, value):
 		'''Creates a new real literal term'''
+		if self.sharing:
+			# NOTE: repr distinguishes 0.0 from -0.0
+			return self._share((types.REAL, repr(value)), term.Real, value)
 		return term.Real(self, value)
 
 	def makeStr(self, value):
 		'''Creates a new string literal term'''
+		if self.sharing:
+			return self._share((types.STR, value), term.Str, value)
 		return term.Str(self, value)
 
 	def makeNil(self):
@@ -58,14 +121,27 @@ class Factory(object):
 
 	def makeCons(self, head, tail):
 		'''Creates a new extended list term'''
+		if self.sharing:
+			# subterms are shared too, so their identity suffices
+			key = (types.CONS, id(head), id(tail))
+			return self._share(key, term.Cons, head, tail)
 		return term.Cons(self, head, tail)
 
 	def makeList(self, seq):
-		'''Creates a new list from a sequence.'''
-		accum = self.makeNil()
-		for elm in reversed(seq):
-			accum = self.makeCons(elm, accum)
-		return accum
+		'''Creates a new list from a sequence.
+
+		Long lists are backed by an array, unless maximal sharing is enabled.
+		'''
+		elms = tuple(seq)
+		if self.sharing or len(elms) < self.MIN_ARRAY_LEN:
+			accum = self.makeNil()
+			for elm in reversed(elms):
+				accum = self.makeCons(elm, accum)
+			return accum
+		for elm in elms:
+			if not isinstance(elm, term.Term):
+				raise TypeError("element is not a term", elm)
+		return term.Array(self, elms)
 
 	def makeTuple(self, args = None, annotations = None):
 		'''Creates a new tuple term'''
@@ -77,6 +153,10 @@ class Factory(object):
 			args = ()
 		if annotations is None:
 			annotations = self.makeNil()
+		if self.sharing:
+			args = tuple(args)
+			key = (types.APPL, name, id(annotations)) + tuple(map(id, args))
+			return self._share(key, term.Appl, name, args, annotations)
 		return term.Appl(self, name, args, annotations)
 
 	def coerce(self, value, name = None):
@@ -115,7 +195,16 @@ class Factory(object):
 	def readFromTextFile(self, fp):
 		'''Creates a new term by parsing from a text stream.'''
 
-		return self._parse(lexer.Lexer(fp = fp))
+		return read.parse(self, fp.read())
+
+	def readFromBinaryFile(self, fp, lazy = False):
+		'''Creates a new term by reading from a binary stream. If lazy is
+		true the file, which must be indexed, is memory-mapped and its
+		subterms are only read on demand. See L{aterm.lazy}.'''
+
+		if lazy:
+			return _lazy.load(self, fp)
+		return binary.readFromBinaryFile(self, fp)
 
 	def parse(self, buf):
 		'''Creates a new term by parsing a string.'''
@@ -125,27 +214,39 @@ class Factory(object):
 		except KeyError:
 			pass
 
-		result = self._parse(lexer.Lexer(buf))
-
-		if len(self.parseCache) > self.MAX_PARSE_CACHE_LEN:
-			# TODO: use a LRU cache policy
-			self.parseCache.clear()
+		result = read.parse(self, buf)
 		self.parseCache[buf] = result
-
 		return result
 
+	def getCacheStats(self):
+		'''Return the statistics of the parse, match and build caches, as a
+		dictionary of dictionaries. See L{cache.LRUCache.stats}.'''
+		return {
+			'parse': self.parseCache.stats(),
+			'match': self.matchCache.stats(),
+			'build': self.buildCache.stats(),
+		}
+
+	def _parsePattern(self, Parser, pattern):
+		'''Parses a string pattern with the given parser class.'''
+		p = Parser(lexer.Lexer(pattern))
+		try:
+			return p.term()
+		except antlr.ANTLRException, exc:
+			raise exception.ParseError(str(exc))
+
 	def match(self, pattern, term):
 		'''Matches the term to a string pattern and a list of arguments.
 		'''
 		assert isinstance(pattern, basestring)
-		from aterm.match import Parser, Match
-		p = Parser(lexer.Lexer(pattern))
+		from aterm.match import Compiler, Match
 		try:
-			matcher = p.term()
-		except antlr.ANTLRException, exc:
-			raise exception.ParseError(str(exc))
+			matcher = self.matchCache[pattern]
+		except KeyError:
+			matcher = self._parsePattern(Compiler, pattern)
+			self.matchCache[pattern] = matcher
 		mo = Match()
-		if matcher.visit(term, mo):
+		if matcher(term, mo):
 			return mo
 		else:
 			return None
@@ -157,11 +258,11 @@ class Factory(object):
 		'''
 		assert isinstance(pattern, basestring)
 		from aterm.build import Parser
-		p = Parser(lexer.Lexer(pattern))
 		try:
-			builder = p.term()
-		except antlr.ANTLRException, exc:
-			raise exception.ParseError(str(exc))
+			builder = self.buildCache[pattern]
+		except KeyError:
+			builder = self._parsePattern(Parser, pattern)
+			self.buildCache[pattern] = builder
 
 		i = 0
 		_args = []
@@ -1,58 +1,110 @@
 '''Term hash computation.'''
 
 
-from aterm import visitor
+from aterm import types
 
 
-class _StructuralHash(visitor.Visitor):
+# TODO: use a more efficient hash function
 
-	# TODO: use a more efficient hash function
+def _hashLit(term):
+	return hash((
+		term.type,
+		term.value
+	))
 
-	def visitTerm(self, term):
-		assert False
+def _hashNil(term):
+	return hash((
+		term.type,
+	))
 
-	def visitLit(self, term):
-		return hash((
-			term.type,
-			term.value
-		))
+_nilHash = hash((types.NIL,))
 
-	def visitNil(self, term):
-		return hash((
-			term.type,
-		))
+def _hashCons(term):
+	return hash((
+		term.type,
+		term.head._hash,
+		term.tail._hash,
+	))
 
-	def visitCons(self, term):
-		return hash((
-			term.type,
-			self.visit(term.head),
-			self.visit(term.tail),
-		))
+def _hashAppl(term):
+	return hash((
+		term.type,
+		term.name,
+		tuple([arg._hash for arg in term.args]),
+	))
 
-	def visitAppl(self, term):
-		return hash((
-			term.type,
-			term.name,
-			term.args,
-		))
 
 def structuralHash(term):
-	'''Perform hashing without considering annotations.'''
-	visitor = _StructuralHash()
-	return visitor.visit(term)
+	'''Perform hashing without considering annotations.
 
+	The hash is cached on the term and on all its subterms. Terms are
+	traversed with an explicit stack, so that arbitrarily deep or long terms
+	can be hashed.
+	'''
+	result = term._hash
+	if result is not None:
+		return result
 
-class _FullHash(_StructuralHash):
-
-	def visitAppl(self, term):
-		term_hash = _StructuralHash.visitAppl(self, term)
-		if term.annotations:
-			annos_hash = structuralHash(term.annotations)
-			return hash(term_hash, annos_hash)
+	stack = [term]
+	push = stack.append
+	pop = stack.pop
+	while stack:
+		# post-order traversal: a term is only hashed after all its subterms
+		current = stack[-1]
+		if current._hash is not None:
+			pop()
+			continue
+		type = current.type
+		if type & types.LIT:
+			current._hash = _hashLit(current)
+			pop()
+		elif type == types.NIL:
+			current._hash = _hashNil(current)
+			pop()
+		elif type == types.CONS and current.elms is not None:
+			# hash arrays as cons chains, but without creating their tails
+			elms = current.getElms()
+			pending = [elm for elm in elms if elm._hash is None]
+			if pending:
+				pending.reverse()
+				stack.extend(pending)
+			else:
+				result = _nilHash
+				for elm in reversed(elms):
+					result = hash((type, elm._hash, result))
+				current._hash = result
+				pop()
+		elif type == types.CONS:
+			head = current.head
+			tail = current.tail
+			if head._hash is None or tail._hash is None:
+				if tail._hash is None:
+					push(tail)
+				if head._hash is None:
+					push(head)
+			else:
+				current._hash = _hashCons(current)
+				pop()
+		elif type == types.APPL:
+			pending = [arg for arg in current.args if arg._hash is None]
+			if pending:
+				pending.reverse()
+				stack.extend(pending)
+			else:
+				current._hash = _hashAppl(current)
+				pop()
 		else:
-			return term_hash
+			raise TypeError('not a term', current)
+
+	return term._hash
+
 
 def fullHash(term):
-	'''Full hash.'''
-	visitor = _FullHash()
-	return visitor.visit(term)
+	'''Full hash. Only the annotations of the term itself, and not of its
+	subterms, are taken into account.'''
+	term_hash = structuralHash(term)
+	if types.isAppl(term) and term.annotations:
+		annos_hash = structuralHash(term.annotations)
+		return hash((term_hash, annos_hash))
+	else:
+		return term_hash
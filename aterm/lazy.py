@@ -0,0 +1,187 @@
+'''Lazy loading of terms from indexed binary files.
+
+The file is memory-mapped and terms are only read from it when they are
+reached, so that memory use is proportional to the part of the term which is
+actually visited, rather than to the file size. Application terms are read
+on first access to their name, arguments or annotations, while lists and
+literals are read as soon as they are reached.
+
+Terms read once are kept in a weak cache, so that they are shared for as long
+as they are alive. Note that lazily loaded terms are not maximally shared
+with the terms made by the factory.
+
+The files must have been written with an index, e.g., with
+C{term.writeToBinaryFile(fp, index = True)}.
+'''
+
+
+import os
+import mmap
+import struct
+import weakref
+
+from aterm import exception
+from aterm import types
+from aterm import term
+from aterm import binary
+
+
+class Appl(term.Appl):
+	'''Application term whose contents are read on demand.'''
+
+	__slots__ = ['_loader', '_node', '_name', '_args', '_annos']
+
+	def __init__(self, factory, loader, node):
+		term.Term.__init__(self, factory)
+		self._loader = loader
+		self._node = node
+		self._name = None
+		self._args = None
+		self._annos = None
+
+	def _load(self):
+		self._name, self._args, self._annos = self._loader.readAppl(self._node)
+		# the loader is no longer needed
+		self._loader = None
+
+	def getName(self):
+		if self._args is None:
+			self._load()
+		return self._name
+
+	def getArgs(self):
+		if self._args is None:
+			self._load()
+		return self._args
+
+	def getAnnotations(self):
+		if self._args is None:
+			self._load()
+		return self._annos
+
+	name = property(getName)
+	args = property(getArgs)
+	annotations = property(getAnnotations)
+
+
+class Loader(object):
+	'''Reads the terms of a memory-mapped indexed binary file on demand.'''
+
+	def __init__(self, factory, fp):
+		self.factory = factory
+
+		fileno = fp.fileno()
+		size = os.fstat(fileno).st_size
+		footerSize = struct.calcsize(binary.INDEX_FOOTER) + len(binary.INDEX_MAGIC)
+		if size < len(binary.MAGIC) + footerSize:
+			raise exception.ParseError('not an indexed binary term file')
+		self.buf = buf = mmap.mmap(fileno, size, access = mmap.ACCESS_READ)
+		if buf[:len(binary.MAGIC)] != binary.MAGIC:
+			raise exception.ParseError('not a binary term file')
+		if buf[size - len(binary.INDEX_MAGIC):] != binary.INDEX_MAGIC:
+			raise exception.ParseError('binary term file has no index')
+
+		self.nodeIndex, self.nodes, self.symbols, self.root = struct.unpack_from(
+			binary.INDEX_FOOTER, buf, size - footerSize)
+		self.symbolIndex = self.nodeIndex + 8*self.nodes
+		if self.symbolIndex + 8*self.symbols + footerSize != size or self.root >= self.nodes:
+			raise exception.ParseError('invalid binary term file index')
+
+		self.symbolCache = {}
+		self.termCache = weakref.WeakValueDictionary()
+
+	def _offset(self, index, number, count):
+		if not 0 <= number < count:
+			raise exception.ParseError('invalid reference %d in binary term file' % number)
+		return struct.unpack_from('<Q', self.buf, index + 8*number)[0]
+
+	def getSymbol(self, symbol):
+		'''Get the name of a symbol.'''
+		try:
+			return self.symbolCache[symbol]
+		except KeyError:
+			pass
+		buf = self.buf
+		pos = self._offset(self.symbolIndex, symbol, self.symbols)
+		if ord(buf[pos]) != binary.SYMBOL:
+			raise exception.ParseError('invalid symbol record in binary term file')
+		length, pos = binary.decodeVarint(buf, pos + 1)
+		name = buf[pos:pos + length]
+		self.symbolCache[symbol] = name
+		return name
+
+	def getTerm(self, node):
+		'''Get the term of a node.'''
+		try:
+			return self.termCache[node]
+		except KeyError:
+			pass
+
+		factory = self.factory
+		buf = self.buf
+		pos = self._offset(self.nodeIndex, node, self.nodes)
+		tag = ord(buf[pos])
+		pos += 1
+		if tag == binary.APPL or tag == binary.ANNOS:
+			result = Appl(factory, self, node)
+		elif tag == binary.INT:
+			value, pos = binary.decodeVarint(buf, pos)
+			result = factory.makeInt(binary.decodeZigzag(value))
+		elif tag == binary.REAL:
+			result = factory.makeReal(struct.unpack_from('<d', buf, pos)[0])
+		elif tag == binary.STR:
+			length, pos = binary.decodeVarint(buf, pos)
+			result = factory.makeStr(buf[pos:pos + length])
+		elif tag == binary.NIL:
+			result = factory.makeNil()
+		elif tag == binary.LIST:
+			length, pos = binary.decodeVarint(buf, pos)
+			refs, pos = self._readRefs(pos, length + 1)
+			elms = [self.getTerm(ref) for ref in refs]
+			tail = elms.pop()
+			if tail.type == types.NIL:
+				result = factory.makeList(elms)
+			else:
+				result = tail
+				for elm in reversed(elms):
+					result = factory.makeCons(elm, result)
+		else:
+			raise exception.ParseError('invalid record %r in binary term file' % tag)
+
+		self.termCache[node] = result
+		return result
+
+	def _readRefs(self, pos, count):
+		buf = self.buf
+		decodeVarint = binary.decodeVarint
+		refs = []
+		for i in xrange(count):
+			ref, pos = decodeVarint(buf, pos)
+			refs.append(ref)
+		return refs, pos
+
+	def readAppl(self, node):
+		'''Read the name, arguments and annotations of an application node.'''
+		buf = self.buf
+		pos = self._offset(self.nodeIndex, node, self.nodes)
+		tag = ord(buf[pos])
+		symbol, pos = binary.decodeVarint(buf, pos + 1)
+		arity, pos = binary.decodeVarint(buf, pos)
+		if tag == binary.ANNOS:
+			refs, pos = self._readRefs(pos, arity + 1)
+			annos = self.getTerm(refs.pop())
+		else:
+			refs, pos = self._readRefs(pos, arity)
+			annos = self.factory.makeNil()
+		args = tuple([self.getTerm(ref) for ref in refs])
+		return self.getSymbol(symbol), args, annos
+
+	def getRoot(self):
+		'''Get the root term.'''
+		return self.getTerm(self.root)
+
+
+def load(factory, fp):
+	'''Lazily load the root term of an indexed binary file.'''
+	loader = Loader(factory, fp)
+	return loader.getRoot()
@@ -2,7 +2,6 @@
 
 
 from aterm import types
-from aterm import visitor
 
 
 def empty(term):
@@ -15,6 +14,8 @@ def length(term):
 	length = 0
 	while not types.isNil(term):
 		assert types.isCons(term)
+		if term.elms is not None:
+			return length + len(term)
 		length += 1
 		term = term.tail
 	return length
@@ -29,33 +30,26 @@ def item(term, index):
 			raise IndexError('index out of bounds')
 		if not types.isCons(term):
 			raise TypeError('not a list term', term)
+		if term.elms is not None:
+			return term[index]
 		if index == 0:
 			return term.head
 		index -= 1
 		term = term.tail
 
 
-class Iter(visitor.Visitor):
+def Iter(term):
 	'''List term iterator.'''
-
-	def __init__(self, term):
-		visitor.Visitor.__init__(self)
-		self.term = term
-
-	def next(self):
-		return self.visit(self.term)
-
-	def visitTerm(self, term):
+	while types.isCons(term):
+		if term.elms is not None:
+			for elm in term.getElms():
+				yield elm
+			return
+		yield term.head
+		term = term.tail
+	if not types.isNil(term):
 		raise TypeError('not a list term', term)
 
-	def visitNil(self, term):
-		raise StopIteration
-
-	def visitCons(self, term):
-		head = term.head
-		self.term = term.tail
-		return head
-
 
 def extend(head, tail):
 	'''Return the concatenation of two list terms.'''
@@ -64,7 +58,7 @@ def extend(head, tail):
 	if types.isNil(tail):
 		return head
 	factory = tail.factory
-	for elm in reversed(head):
+	for elm in reversed(list(head)):
 		tail = factory.makeCons(elm, tail)
 	return tail
 
@@ -90,11 +84,9 @@ def insert(term, index, other):
 
 def reverse(term):
 	'''Reverse a list term.'''
-	factory = term.factory
-	accum = factory.makeNil()
-	for elm in term:
-		accum = factory.makeCons(elm, accum)
-	return accum
+	elms = list(term)
+	elms.reverse()
+	return term.factory.makeList(elms)
 
 
 def map(function, term):
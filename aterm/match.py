@@ -1,6 +1,7 @@
 '''Term pattern matching.'''
 
 
+from aterm import types
 from aterm import visitor
 from aterm import parser
 
@@ -191,3 +192,113 @@ class Parser(parser.Parser):
 	def handleApplCons(self, name, args, annos=None):
 		# ignore annotations
 		return ApplCons(name, args)
+
+
+class Compiler(parser.Parser):
+	'''Parse a term pattern into a matching function.
+
+	Matching functions take a term and a L{Match} object, and return whether
+	the term matches the pattern. Unlike L{Matcher} trees, they do not
+	dispatch through the visitor machinery.
+	'''
+
+	def handleInt(self, value):
+		def matchInt(term, match):
+			return term.type == types.INT and term.value == value
+		return matchInt
+
+	def handleReal(self, value):
+		def matchReal(term, match):
+			return term.type == types.REAL and term.value == value
+		return matchReal
+
+	def handleStr(self, value):
+		def matchStr(term, match):
+			return term.type == types.STR and term.value == value
+		return matchStr
+
+	def handleNil(self):
+		def matchNil(term, match):
+			return term.type == types.NIL
+		return matchNil
+
+	def handleCons(self, head, tail):
+		def matchCons(term, match):
+			return (
+				term.type == types.CONS and
+				head(term.head, match) and
+				tail(term.tail, match)
+			)
+		return matchCons
+
+	def handleAppl(self, name, args, annos=None):
+		# ignore annotations
+		args = tuple(args)
+		arity = len(args)
+		if arity == 0:
+			def matchAppl(term, match):
+				return (
+					term.type == types.APPL and
+					term.name == name and
+					not term.args
+				)
+		elif arity == 1:
+			arg, = args
+			def matchAppl(term, match):
+				if term.type != types.APPL or term.name != name:
+					return False
+				term_args = term.args
+				return len(term_args) == 1 and arg(term_args[0], match)
+		elif arity == 2:
+			arg0, arg1 = args
+			def matchAppl(term, match):
+				if term.type != types.APPL or term.name != name:
+					return False
+				term_args = term.args
+				return (
+					len(term_args) == 2 and
+					arg0(term_args[0], match) and
+					arg1(term_args[1], match)
+				)
+		else:
+			def matchAppl(term, match):
+				if term.type != types.APPL or term.name != name:
+					return False
+				term_args = term.args
+				if len(term_args) != arity:
+					return False
+				for arg, term_arg in zip(args, term_args):
+					if not arg(term_arg, match):
+						return False
+				return True
+		return matchAppl
+
+	def handleWildcard(self):
+		def matchWildcard(term, match):
+			match.args.append(term)
+			return True
+		return matchWildcard
+
+	def handleVar(self, name):
+		def matchVar(term, match):
+			kargs = match.kargs
+			try:
+				value = kargs[name]
+			except KeyError:
+				kargs[name] = term
+				return True
+			else:
+				return value == term
+		return matchVar
+
+	def handleApplCons(self, name, args, annos=None):
+		# ignore annotations
+		def matchApplCons(term, match):
+			if term.type != types.APPL:
+				return False
+			factory = term.factory
+			return (
+				name(factory.makeStr(term.name), match) and
+				args(factory.makeList(term.args), match)
+			)
+		return matchApplCons
@@ -8,6 +8,7 @@ from aterm import types
 from aterm import visitor
 from aterm import project
 from aterm import annotation
+from aterm import cache
 
 
 PRECEDENT = -2
@@ -169,6 +170,100 @@ class Path(object):
 	__str__ = toStr
 
 
+class Index(object):
+	'''Positional index of the subterms of a term.
+
+	The index is built once per term, and then maps paths to subterms in
+	time proportional to the path length, instead of walking the lists
+	element by element. The elements of the lists along the way are
+	remembered as tuples.
+	'''
+
+	__slots__ = ['term', '_elms']
+
+	def __init__(self, term):
+		self.term = term
+		self._elms = {}
+
+	def children(self, term):
+		'''Return the sequence of the direct subterms of a term.'''
+		if term.type == types.APPL:
+			return term.args
+		if term.type & types.LIST:
+			try:
+				return self._elms[id(term)][1]
+			except KeyError:
+				elms = tuple(term)
+				# keep the list alive, so that its id is not reused
+				self._elms[id(term)] = term, elms
+				return elms
+		return ()
+
+	def _child(self, term, index):
+		try:
+			return self.children(term)[index]
+		except IndexError:
+			raise IndexError('index out of range', index)
+
+	def project(self, path):
+		'''Project the subterm at a path.'''
+		term = self.term
+		for index in path.indices:
+			term = self._child(term, index)
+		return term
+
+	def transform(self, path, func):
+		'''Transform the subterm at a path, rebuilding only its ancestors.'''
+		ancestors = []
+		term = self.term
+		for index in path.indices:
+			ancestors.append((term, index))
+			term = self._child(term, index)
+		new = func(term)
+		if new is term:
+			return self.term
+		while ancestors:
+			term, index = ancestors.pop()
+			new = self._replace(term, index, new)
+		return new
+
+	def _replace(self, term, index, new):
+		factory = term.factory
+		if term.type == types.APPL:
+			args = list(term.args)
+			args[index] = new
+			return factory.makeAppl(term.name, args, term.annotations)
+		elms = self.children(term)
+		if term.elms is not None:
+			return factory.makeList(elms[:index] + (new,) + elms[index + 1:])
+		# share the tail of the list after the index
+		tail = term
+		for i in range(index + 1):
+			tail = tail.tail
+		result = factory.makeCons(new, tail)
+		for elm in reversed(elms[:index]):
+			result = factory.makeCons(elm, result)
+		return result
+
+
+# indices of the most recently used terms
+_indices = cache.LRUCache(8)
+
+def index(term):
+	'''Get the positional index of a term, reusing the index of the same term
+	object when it was recently indexed.'''
+	try:
+		indexed, result = _indices[id(term)]
+	except KeyError:
+		pass
+	else:
+		if indexed is term:
+			return result
+	result = Index(term)
+	_indices[id(term)] = term, result
+	return result
+
+
 class _Annotator(visitor.Visitor):
 
 	def __init__(self, func = None):
@@ -199,13 +294,68 @@ class _Annotator(visitor.Visitor):
 		else:
 			return term
 
-def annotate(term, root = None, func = None):
+class _Reannotator(_Annotator):
+	'''Annotator which reuses the subterms found unchanged, i.e., the very
+	same objects, at the same position of a previously annotated term.'''
+
+	def visitTerm(self, term, path, old):
+		return term
+
+	def _children(self, old, type):
+		if old is not None and old.type & type:
+			return list(old)
+		return ()
+
+	def visitCons(self, term, path, old):
+		if term is old:
+			return term
+		factory = term.factory
+		olds = self._children(old, types.LIST)
+		elms = []
+		for index, elm in itertools.izip(itertools.count(), term):
+			if index < len(olds):
+				oldelm = olds[index]
+			else:
+				oldelm = None
+			elms.append(self.visit(elm, factory.makeCons(factory.makeInt(index), path), oldelm))
+		return factory.makeList(elms)
+
+	def visitAppl(self, term, path, old):
+		if term is old:
+			return term
+		factory = term.factory
+		if old is not None and old.type == types.APPL:
+			olds = old.args
+		else:
+			olds = ()
+		args = []
+		for index, arg in itertools.izip(itertools.count(), term.args):
+			if index < len(olds):
+				oldarg = olds[index]
+			else:
+				oldarg = None
+			args.append(self.visit(arg, factory.makeCons(factory.makeInt(index), path), oldarg))
+		term = factory.makeAppl(term.name, args, term.annotations)
+		if self.func(term):
+			return annotation.set(term, factory.makeAppl('Path', [path]))
+		else:
+			return term
+
+def annotate(term, root = None, func = None, previous = None):
 	'''Recursively annotates the terms and all subterms with their
-	path.'''
-	annotator = _Annotator(func)
+	path.
+
+	When a previous version of the term, annotated with the same root and
+	function, is given, its subterms which are found unchanged at the same
+	position are reused, so that only the changed parts are annotated again.
+	'''
 	if root is None:
 		root = term.factory.makeNil()
-	return annotator.visit(term, root)
+	if previous is None:
+		annotator = _Annotator(func)
+		return annotator.visit(term, root)
+	annotator = _Reannotator(func)
+	return annotator.visit(term, root, previous)
 
 
 class _DeAnnotator(_Annotator):
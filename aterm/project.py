@@ -3,6 +3,7 @@
 
 from aterm.factory import factory
 from aterm import visitor
+from aterm import lists
 
 
 class _Subterms(visitor.Visitor):
@@ -30,10 +31,7 @@ class _Subterm(visitor.Visitor):
 		raise IndexError('index out of bounds')
 
 	def visitCons(self, term, index):
-		if index == 0:
-			return term.head
-		else:
-			return self.visit(term.tail, index - 1)
+		return lists.item(term, index)
 
 	def visitAppl(self, term, index):
 		return term.args[index]
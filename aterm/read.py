@@ -0,0 +1,210 @@
+'''Term reading.
+
+A hand-written parser for the textual representation of plain terms, i.e.,
+without wildcards or variables. It accepts the same syntax and produces the
+same terms as L{aterm.parser.Parser} (which is still used for patterns), but
+tokenizes with a single regular expression and builds the terms with an
+explicit stack, so that it is considerably faster and arbitrarily deep terms
+can be read.
+'''
+
+
+import re
+
+from aterm import exception
+
+
+_REAL, _INT, _STR, _CONS, _SYM, _OTHER = range(1, 7)
+
+_tokenRe = re.compile(r'''
+	[ \t\f\r\n]*
+	(?:
+		# REAL
+		(-?(?:(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?|[0-9]+[eE][-+]?[0-9]+))
+	|
+		# INT
+		(-?[0-9]+)
+	|
+		# STR
+		"([^"\\]*(?:\\.[^"\\]*)*)"
+	|
+		# CONS
+		([A-Z][a-zA-Z0-9_]*)
+	|
+		# symbols
+		([][(){},])
+	|
+		# variables and wildcards, which are valid tokens but not valid terms
+		([a-z][a-zA-Z0-9_]*|[_*])
+	)
+''', re.VERBOSE | re.DOTALL)
+
+_spaceRe = re.compile(r'[ \t\f\r\n]*')
+
+# NOTE: the empty string is in here too, which is harmless
+_spaces = ' \t\f\r\n'
+
+_ARGS, _LIST, _ANNOS = range(3)
+
+_closers = {
+	_ARGS: ')',
+	_LIST: ']',
+	_ANNOS: '}',
+}
+
+
+def _unescape(text):
+	'''Unescape a string literal, exactly like L{aterm.lexer.Lexer} does.'''
+	if '\\' in text:
+		text = text.replace('\\r', '\r')
+		text = text.replace('\\n', '\n')
+		text = text.replace('\\t', '\t')
+		text = text.replace('\\', '')
+	return text
+
+
+def _error(buf, pos):
+	'''Build a parse error for the token at the given position.'''
+	pos = _spaceRe.match(buf, pos).end()
+	line = buf.count('\n', 0, pos) + 1
+	col = pos - (buf.rfind('\n', 0, pos) + 1) + 1
+	if pos >= len(buf):
+		token = 'end of input'
+	else:
+		token = repr(buf[pos:pos + 16])
+	return exception.ParseError('unexpected %s at line %d, column %d' % (token, line, col))
+
+
+def parse(factory, buf, pos = 0):
+	'''Parse a term from a string, starting at the given position.'''
+
+	match = _tokenRe.match
+	skip = _spaceRe.match
+	makeInt = factory.makeInt
+	makeReal = factory.makeReal
+	makeStr = factory.makeStr
+	makeList = factory.makeList
+	makeAppl = factory.makeAppl
+
+	# each frame holds the kind of the enclosing construct, the application
+	# name (for arguments) or name and arguments (for annotations), and the
+	# elements read so far
+	stack = []
+	while True:
+		# read a term, or the start of a compound term
+		appl = None
+		frame = None
+		c = buf[pos:pos + 1]
+		if c in _spaces:
+			pos = skip(buf, pos).end()
+			c = buf[pos:pos + 1]
+		if c == '(':
+			pos += 1
+			frame = [_ARGS, '', []]
+		elif c == '[':
+			pos += 1
+			frame = [_LIST, None, []]
+		else:
+			mo = match(buf, pos)
+			if mo is None:
+				raise _error(buf, pos)
+			kind = mo.lastindex
+			pos = mo.end()
+			if kind == _CONS:
+				name = mo.group(_CONS)
+				c = buf[pos:pos + 1]
+				if c in _spaces:
+					end = skip(buf, pos).end()
+					if buf[end:end + 1] == '(':
+						pos = end
+						c = '('
+				if c == '(':
+					pos += 1
+					frame = [_ARGS, name, []]
+				else:
+					appl = name, []
+			elif kind == _INT:
+				term = makeInt(int(mo.group(_INT)))
+			elif kind == _STR:
+				term = makeStr(_unescape(mo.group(_STR)))
+			elif kind == _REAL:
+				term = makeReal(float(mo.group(_REAL)))
+			else:
+				raise _error(buf, mo.start(kind))
+
+		if frame is not None:
+			# check for an empty argument list or list
+			c = buf[pos:pos + 1]
+			if c in _spaces:
+				pos = skip(buf, pos).end()
+				c = buf[pos:pos + 1]
+			if c != _closers[frame[0]]:
+				stack.append(frame)
+				continue
+			pos += 1
+			if frame[0] == _ARGS:
+				appl = frame[1], []
+			else:
+				term = makeList(())
+
+		# reduce the completed terms
+		while True:
+			c = buf[pos:pos + 1]
+			if c in _spaces:
+				pos = skip(buf, pos).end()
+				c = buf[pos:pos + 1]
+
+			if appl is not None:
+				# an application may be followed by annotations
+				if c == '{':
+					pos += 1
+					c = buf[pos:pos + 1]
+					if c in _spaces:
+						pos = skip(buf, pos).end()
+						c = buf[pos:pos + 1]
+					if c != '}':
+						stack.append([_ANNOS, appl, []])
+						break
+					pos += 1
+					c = buf[pos:pos + 1]
+					if c in _spaces:
+						pos = skip(buf, pos).end()
+						c = buf[pos:pos + 1]
+				name, args = appl
+				term = makeAppl(name, args)
+				appl = None
+
+			if not stack:
+				# like the ANTLR parser, look ahead for one more token
+				if c and match(buf, pos) is None:
+					raise _error(buf, pos)
+				return term
+
+			frame = stack[-1]
+			frame[2].append(term)
+
+			closer = _closers[frame[0]]
+			if c == ',':
+				pos += 1
+				if frame[0] == _ARGS:
+					break
+				# lists and annotations may end with a comma
+				c = buf[pos:pos + 1]
+				if c in _spaces:
+					pos = skip(buf, pos).end()
+					c = buf[pos:pos + 1]
+				if c != closer:
+					break
+			elif c != closer:
+				raise _error(buf, pos)
+			pos += 1
+
+			stack.pop()
+			kind, name, elms = frame
+			if kind == _ARGS:
+				appl = name, elms
+			elif kind == _LIST:
+				term = makeList(elms)
+			else:
+				name, args = name
+				term = makeAppl(name, args, makeList(elms))
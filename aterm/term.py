@@ -9,6 +9,7 @@ from aterm import compare
 from aterm import hash
 from aterm import write
 from aterm import lists
+from aterm import binary
 
 
 class Term(object):
@@ -20,10 +21,12 @@ class Term(object):
 
 	# NOTE: most methods defer the execution to visitors
 
-	__slots__ = ['factory']
+	__slots__ = ['factory', '_hash', '__weakref__']
 
 	def __init__(self, factory):
 		self.factory = factory
+		# structural hash, computed on first use
+		self._hash = None
 
 	# XXX: this has a large inpact in performance
 	if __debug__ and False:
@@ -55,7 +58,10 @@ class Term(object):
 		'''Generate a hash value for this term.
 		Annotations are not taken into account.
 		'''
-		return hash.structuralHash(self)
+		result = self._hash
+		if result is None:
+			result = hash.structuralHash(self)
+		return result
 
 	__hash__ = getStructuralHash
 
@@ -70,6 +76,8 @@ class Term(object):
 		return compare.isEqual(self, other)
 
 	def __eq__(self, other):
+		if self is other:
+			return True
 		if not isinstance(other, Term):
 			# TODO: produce a warning
 			return False
@@ -88,18 +96,16 @@ class Term(object):
 
 	def writeToTextFile(self, fp):
 		'''Write this term to a file object.'''
-		writer = write.TextWriter(fp)
-		writer.visit(self)
+		write.writeText(self, fp)
+
+	def writeToBinaryFile(self, fp, index = False):
+		'''Write this term to a binary file object. If index is true, the
+		file can be loaded lazily with L{aterm.lazy}.'''
+		binary.writeToBinaryFile(self, fp, index)
 
 	def __str__(self):
 		'''Get the string representation of this term.'''
-		try:
-			from cStringIO import StringIO
-		except ImportError:
-			from StringIO import StringIO
-		fp = StringIO()
-		self.writeToTextFile(fp)
-		return fp.getvalue()
+		return write.toText(self)
 
 	def __repr__(self):
 		try:
@@ -187,6 +193,9 @@ class List(Term):
 
 	__slots__ = []
 
+	# tuple of elements, for list terms backed by an array
+	elms = None
+
 	# Python's list compatability methods
 
 	def __nonzero__(self):
@@ -196,6 +205,8 @@ class List(Term):
 		return lists.length(self)
 
 	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return self.factory.makeList(list(self)[index])
 		return lists.item(self, index)
 
 	def __iter__(self):
@@ -251,6 +262,76 @@ class Cons(List):
 		return visitor.visitCons(self, *args, **kargs)
 
 
+class Array(List):
+	'''Concatenated list term backed by a tuple.
+
+	To visitors, matchers and writers it is undistinguishable from a chain of
+	L{Cons} terms, but its length, indexing and slicing take constant time.
+	Arrays must not be empty, and are usually created by L{factory.Factory.makeList}.
+	'''
+
+	__slots__ = ['elms', 'start', 'end', '_tail']
+
+	type = types.CONS
+
+	def __init__(self, factory, elms, start = 0, end = None):
+		List.__init__(self, factory)
+		if end is None:
+			end = len(elms)
+		assert 0 <= start < end <= len(elms)
+		self.elms = elms
+		self.start = start
+		self.end = end
+		self._tail = None
+
+	def getHead(self):
+		return self.elms[self.start]
+
+	head = property(getHead)
+
+	def getTail(self):
+		tail = self._tail
+		if tail is None:
+			# cache the tail, so that it keeps its identity
+			start = self.start + 1
+			if start < self.end:
+				tail = Array(self.factory, self.elms, start, self.end)
+			else:
+				tail = self.factory.makeNil()
+			self._tail = tail
+		return tail
+
+	tail = property(getTail)
+
+	def getElms(self):
+		'''Get the tuple with the elements of this list.'''
+		if self.start == 0 and self.end == len(self.elms):
+			return self.elms
+		return self.elms[self.start:self.end]
+
+	def __len__(self):
+		return self.end - self.start
+
+	def __getitem__(self, index):
+		length = self.end - self.start
+		if isinstance(index, slice):
+			start, stop, step = index.indices(length)
+			if step != 1:
+				return self.factory.makeList(self.getElms()[index])
+			if start >= stop:
+				return self.factory.makeNil()
+			return Array(self.factory, self.elms, self.start + start, self.start + stop)
+		if index < 0 or index >= length:
+			raise IndexError('index out of bounds')
+		return self.elms[self.start + index]
+
+	def __iter__(self):
+		return iter(self.getElms())
+
+	def accept(self, visitor, *args, **kargs):
+		return visitor.visitCons(self, *args, **kargs)
+
+
 class Appl(Term):
 	'''Application term.'''
 
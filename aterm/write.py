@@ -5,6 +5,26 @@ from aterm import types
 from aterm import visitor
 
 
+# number of text fragments gathered before they are joined into a chunk
+CHUNK_PARTS = 4096
+
+
+def _formatReal(value):
+	if float(int(value)) == value:
+		return '%0.1f' % value
+	else:
+		return '%g' % value
+
+
+def _formatStr(value):
+	s = str(value)
+	s = s.replace('\"', '\\"')
+	s = s.replace('\t', '\\t')
+	s = s.replace('\r', '\\r')
+	s = s.replace('\n', '\\n')
+	return '"' + s + '"'
+
+
 class Writer(visitor.Visitor):
 	'''Base class for term writers.'''
 
@@ -29,19 +49,10 @@ class TextWriter(Writer):
 		self.fp.write(str(term.value))
 
 	def visitReal(self, term):
-		value = term.value
-		if float(int(value)) == value:
-			self.fp.write('%0.1f' % value)
-		else:
-			self.fp.write('%g' % value)
+		self.fp.write(_formatReal(term.value))
 
 	def visitStr(self, term):
-		s = str(term.value)
-		s = s.replace('\"', '\\"')
-		s = s.replace('\t', '\\t')
-		s = s.replace('\r', '\\r')
-		s = s.replace('\n', '\\n')
-		self.fp.write('"' + s + '"')
+		self.fp.write(_formatStr(term.value))
 
 	def visitList(self, term):
 		self.writeList(term, '[', ']')
@@ -55,6 +66,98 @@ class TextWriter(Writer):
 			self.writeList(term.annotations, '{', '}')
 
 
+def _pushList(push, elms, sep = ','):
+	'''Push the elements of a sequence in reverse order, interleaved with
+	separators.'''
+	if elms:
+		push(elms[-1])
+		for elm in elms[-2::-1]:
+			push(sep)
+			push(elm)
+
+
+def iterText(term, chunkParts = CHUNK_PARTS):
+	'''Generate the textual representation of a term in chunks.
+
+	The term is traversed with an explicit stack, so that arbitrarily deep
+	terms can be written, and the text fragments are joined into chunks,
+	so that huge terms can be written to files or sockets without holding
+	the whole text in memory.
+	'''
+
+	parts = []
+	append = parts.append
+
+	# the stack holds both terms and literal text still to be written
+	stack = [term]
+	push = stack.append
+	pop = stack.pop
+	while stack:
+		item = pop()
+		if item.__class__ is str:
+			append(item)
+			continue
+		type = item.type
+		if type == types.INT:
+			append(str(item.value))
+		elif type == types.REAL:
+			append(_formatReal(item.value))
+		elif type == types.STR:
+			append(_formatStr(item.value))
+		elif type == types.NIL:
+			append('[]')
+		elif type == types.CONS:
+			append('[')
+			push(']')
+			_pushList(push, list(item))
+		else:
+			append(item.name)
+			annos = item.annotations
+			if annos.type != types.NIL:
+				push('}')
+				_pushList(push, list(annos))
+				push('{')
+			args = item.args
+			if item.name == '' or args:
+				append('(')
+				push(')')
+				_pushList(push, args)
+
+		if len(parts) >= chunkParts:
+			yield ''.join(parts)
+			del parts[:]
+
+	if parts:
+		yield ''.join(parts)
+
+
+def writeText(term, fp):
+	'''Write the textual representation of a term to a file object.'''
+	write = fp.write
+	for chunk in iterText(term):
+		write(chunk)
+
+
+def writeTextList(elms, fp, begin = '[', end = ']', sep = ','):
+	'''Write the textual representation of a sequence of terms, which may be
+	any iterable, e.g., a generator, so that lists can be written as their
+	elements are produced.'''
+	write = fp.write
+	write(begin)
+	first = True
+	for elm in elms:
+		if not first:
+			write(sep)
+		first = False
+		writeText(elm, fp)
+	write(end)
+
+
+def toText(term):
+	'''Get the textual representation of a term as a string.'''
+	return ''.join(iterText(term))
+
+
 # TODO: implement a pretty-printer
 
 
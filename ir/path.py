@@ -1,6 +1,9 @@
 '''Path/selection related transformations.'''
 
 
+import itertools
+
+from transf import lib
 from transf import parse
 import ir.match
 
@@ -11,13 +14,13 @@ parse.Transfs(r'''
 # Path annotation
 
 # Only annotate term applications
-annotate = path.Annotate(
-	match.ApplNames(`
-		ir.match.stmtNames +
-		ir.match.exprNames +
-		ir.match.typeNames
-	`)
-)
+annotatable = match.ApplNames(`
+	ir.match.stmtNames +
+	ir.match.exprNames +
+	ir.match.typeNames
+`)
+
+annotate = path.Annotate(annotatable)
 
 deannotate = path.deannotate
 
@@ -59,6 +62,29 @@ Apply(t) =
 		deannotate
 	end
 
+# Like Apply, but only the innermost term enclosing the selection for which s
+# succeeds (or the whole term, if none) is given to t, and the result spliced
+# back, so that the cost is proportional to the size of that term. The
+# selection still refers to the whole term, so t must not project it.
+ApplyIn(s, t) =
+	with selection in
+		?[root, [selection, *args]] ;
+		!root ;
+		path.Local(
+			![<id>, args] ;
+			t ;
+			deannotate,
+			!selection,
+			s
+		)
+	end
+
+ApplySelected(t) =
+	ApplyIn(id, t)
+
+ApplyInFunction(t) =
+	ApplyIn(?Function, t)
+
 
 
 WithSelection(s, x) = with selection in x where selection := s end
@@ -94,3 +120,21 @@ hasSelection =
 	)
 
 ''')
+
+
+def reannotate(term, previous):
+	'''Annotate a new version of a term with its paths, reusing the subterms
+	left unchanged from the previous, already annotated, version. Only the
+	subterms which are the very same objects are reused, so a term which was
+	deannotated as a whole (e.g., by L{Apply}) is annotated again entirely.'''
+	return lib.path.Annotate(annotatable, previous = previous)(term)
+
+
+def annotate_stmts(stmts):
+	'''Annotate the statements of a module with their paths, as they are
+	generated, so that modules can be annotated without being held in
+	memory at once.'''
+	for index, stmt in itertools.izip(itertools.count(), stmts):
+		factory = stmt.factory
+		root = factory.makeList([factory.makeInt(index), factory.makeInt(0)])
+		yield lib.path.Annotate(annotatable, root)(stmt)
@@ -13,7 +13,19 @@ class Machine:
 		'''Load an assembly file into a low-level IR aterm.'''
 		raise NotImplementedError
 
-	def translate(self, term):
+	def iterload(self, factory, fp):
+		'''Load an assembly file, generating the low-level IR statements as
+		they are parsed.'''
+		term = self.load(factory, fp)
+		return iter(term.args[0])
+
+	def translate(self, term, jobs = 1):
 		'''Translate the "Asm" terms into the higher-level IR equivalent
-		constructs.'''
+		constructs, optionally using several processes.'''
 		raise NotImplementedError
+
+	def itertranslate(self, factory, stmts):
+		'''Translate a sequence of "Asm" statements, generating the
+		higher-level IR statements as they are translated.'''
+		term = factory.makeAppl('Module', [factory.makeList(list(stmts))])
+		return iter(self.translate(term).args[0])
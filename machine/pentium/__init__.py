@@ -7,7 +7,19 @@ from machine import Machine
 class Pentium(Machine):
 	'''Intel 32-bit architecture processors.'''
 
+	def __init__(self, loader = 'antlr'):
+		'''The loader is either "antlr", for the parser generated from the
+		grammar, or "fast", for the hand-written parser.'''
+		Machine.__init__(self)
+		if loader not in ('fast', 'antlr'):
+			raise ValueError('unknown loader %r' % loader)
+		self.loader = loader
+
 	def load(self, factory, fp):
+		if self.loader == 'fast':
+			from machine.pentium import att
+			return att.parse(factory, fp)
+
 		from machine.pentium.att_lexer import Lexer
 		from machine.pentium.att_parser import Parser
 
@@ -16,10 +28,25 @@ class Pentium(Machine):
 		term = parser.start()
 		return term
 
-	def translate(self, term):
+	def iterload(self, factory, fp):
+		if self.loader == 'fast':
+			from machine.pentium import att
+			return att.Parser(factory, fp).statements()
+
+		from machine.pentium import stream
+		return stream.load(factory, fp)
+
+	def translate(self, term, jobs = 1):
+		if jobs > 1:
+			from machine.pentium import parallel
+			return parallel.translate(term, jobs)
+
 		from machine.pentium import translator
 		from transf.context import Context
 
 		term = translator.doModule.apply(term, Context())
 		return term
 
+	def itertranslate(self, factory, stmts):
+		from machine.pentium import stream
+		return stream.translate(factory, stmts)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+'''Unit tests for the Pentium machine.'''
+
+
+import os.path
+import glob
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from aterm.factory import factory
+
+from machine.pentium import att
+from machine.pentium import parallel
+from machine.pentium import stream
+
+
+def _examples():
+	examples = os.path.join(os.path.dirname(__file__), '..', '..', 'examples')
+	return glob.glob(os.path.join(examples, '*.s'))
+
+
+class TestAtt(unittest.TestCase):
+
+	parseTestCases = [
+		('\n', []),
+		('main:\n', ['Label("main")']),
+		('a: .b: nop\n', ['Label("a")', 'Label(".b")', 'Asm("nop",[])']),
+		('\tmovl\t$1, %eax\n', ['Asm("movl",[Sym("eax"){Reg},Lit(Int(32,Signed),1)])']),
+		('RET ; nop\n', ['Asm("ret",[])', 'Asm("nop",[])']),
+		('pushl $foo\n', ['Asm("pushl",[Sym("foo")])']),
+		('movl -4(%ebp),%eax\n', [
+			'Asm("movl",[Sym("eax"){Reg},Ref(Binary(Plus(Int(32,Signed)),Sym("ebp"){Reg},Lit(Int(32,Signed),-4)))])'
+		]),
+		('movl 0x10(,%ecx,4),%eax\n', [
+			'Asm("movl",[Sym("eax"){Reg},Ref(Binary(Plus(Int(32,Signed)),'
+				'Binary(Plus(Int(32,Signed)),Sym("ecx"){Reg},Lit(Int(32,Signed),4)),'
+				'Lit(Int(32,Signed),16)))])'
+		]),
+		('movl (%eax,%ebx),%ecx\n', [
+			'Asm("movl",[Sym("ecx"){Reg},Ref(Binary(Plus(Int(32,Signed)),Sym("eax"){Reg},Sym("ebx"){Reg}))])'
+		]),
+		('xlat %ds:(%ebx)\n', ['Asm("xlat",[Ref(Sym("ebx"){Reg})])']),
+		('call *%eax\n', ['Asm("call",[Ref(Sym("eax"){Reg})])']),
+		('call *0x10(%eax)\n', [
+			'Asm("call",[Ref(Binary(Plus(Int(32,Signed)),Sym("eax"){Reg},Lit(Int(32,Signed),16)))])'
+		]),
+		('jmp .L2 # comment\n\n', ['Asm("jmp",[Ref(Sym(".L2"))])']),
+		('.text\n.globl main\n.size main, .-main\n', []),
+		('.long -010\n', ['Var(Int(32,NoSign),"i_1",Lit(Int(32,NoSign),-8))']),
+		('.byte 1, 2\n', []),
+		('.ascii "a\\n\\101"\n', ['Var(Pointer(Char(8)),"s_1",Lit(Pointer(Char(8)),"a\\nA"))']),
+	]
+
+	def testParse(self):
+		for input, expected in self.parseTestCases:
+			stmts = list(att.Parser(factory, StringIO(input)).statements())
+			self.failUnlessEqual(
+				[str(stmt) for stmt in stmts],
+				[str(factory.parse(stmt)) for stmt in expected],
+				'%r' % input
+			)
+
+	def testComment(self):
+		# like in the grammar, comments swallow the end of line
+		term = att.parse(factory, StringIO('# comment\nret\n'))
+		self.failUnlessEqual(str(term), 'Module([Asm("ret",[])])')
+		term = att.parse(factory, StringIO('nop # comment\n\n'))
+		self.failUnlessEqual(str(term), 'Module([Asm("nop",[])])')
+
+	def testCounter(self):
+		term = att.parse(factory, StringIO('.byte 1\n.word 2\n.ascii "s"\n'))
+		self.failUnlessEqual(
+			[str(stmt.args[1]) for stmt in term.args[0]],
+			['"i_1"', '"i_2"', '"s_3"']
+		)
+
+	def testErrors(self):
+		for input in [
+			'ret',
+			'movl %eax\n%ebx\n',
+			'movl [eax]\n',
+			'movl (%eax\n',
+			'.ascii "abc\n',
+		]:
+			self.failUnlessRaises(att.ParseError, att.parse, factory, StringIO(input))
+
+	def testExamples(self):
+		filenames = _examples()
+		self.failUnless(filenames)
+		for filename in filenames:
+			att.parse(factory, file(filename, 'rt'))
+
+	def testConformance(self):
+		try:
+			from machine.pentium.att_lexer import Lexer
+			from machine.pentium.att_parser import Parser
+		except ImportError:
+			self.skipTest('the ANTLR parser has not been generated')
+		for filename in _examples():
+			term = att.parse(factory, file(filename, 'rt'))
+			parser = Parser(Lexer(file(filename, 'rt')), factory = factory)
+			expected = parser.start()
+			self.failUnless(term.isEqual(expected), filename)
+
+
+class TestParallel(unittest.TestCase):
+
+	def parseStmts(self, stmts):
+		return [factory.parse(stmt) for stmt in stmts]
+
+	def testSplit(self):
+		stmts = self.parseStmts([
+			'Label("f")', 'Asm("ret",[])',
+			'Label("g")', 'Label(".L1")', 'Asm("nop",[])', 'Asm("ret",[])',
+			'Label("h")', 'Asm("ret",[])',
+		])
+		chunks = parallel.split(stmts, 4)
+		self.failUnlessEqual([len(chunk) for chunk in chunks], [2, 4, 2])
+		for chunk in chunks:
+			self.failUnless(parallel.isFunctionStart(chunk[0]))
+		self.failUnlessEqual(parallel.split(stmts, 1), [stmts])
+
+	def testRenumber(self):
+		term = factory.parse(
+			'[Assign(Int(32,Signed),Sym("tmp1"){Tmp},Sym("eax"){Reg}),'
+			'Assign(Int(32,Signed),Sym("ebx"){Reg},Sym("tmp1"){Tmp}),'
+			'Assign(Int(32,Signed),Sym("tmp2"){Tmp},Sym("tmp3"))]'
+		)
+		result = parallel.renumber(term, 10)
+		self.failUnlessEqual(str(result), str(factory.parse(
+			'[Assign(Int(32,Signed),Sym("tmp11"){Tmp},Sym("eax"){Reg}),'
+			'Assign(Int(32,Signed),Sym("ebx"){Reg},Sym("tmp11"){Tmp}),'
+			'Assign(Int(32,Signed),Sym("tmp12"){Tmp},Sym("tmp3"))]'
+		)))
+		# unchanged subterms are preserved
+		self.failUnless(result[0].args[2] is term[0].args[2])
+		term = factory.parse('[Asm("ret",[])]')
+		self.failUnless(parallel.renumber(term, 10) is term)
+
+	def testRenumberDeep(self):
+		import sys
+		term = factory.parse('Sym("tmp1"){Tmp}')
+		for i in range(sys.getrecursionlimit() + 100):
+			term = factory.makeAppl('Ref', [term])
+		result = parallel.renumber(term, 1)
+		while result.name == 'Ref':
+			result = result.args[0]
+		self.failUnlessEqual(str(result), 'Sym("tmp2"){Tmp}')
+
+	def testTranslate(self):
+		from machine.pentium import Pentium
+		from machine.pentium import common
+		mach = Pentium()
+		filenames = _examples()
+		self.failUnless(filenames)
+		saved = parallel.MIN_PARALLEL_STMTS
+		parallel.MIN_PARALLEL_STMTS = 1
+		try:
+			for filename in filenames:
+				term = mach.load(factory, file(filename, 'rt'))
+				results = []
+				for jobs in (1, 2):
+					common.temp.tmp_no = 0
+					results.append(mach.translate(term, jobs))
+				expected, result = results
+				self.failUnless(result.isEqual(expected), filename)
+		finally:
+			parallel.MIN_PARALLEL_STMTS = saved
+
+
+class TestStream(unittest.TestCase):
+
+	def testChunks(self):
+		stmts = [factory.parse(stmt) for stmt in [
+			'Label("f")', 'Asm("ret",[])',
+			'Label("g")', 'Label(".L1")', 'Asm("nop",[])', 'Asm("ret",[])',
+			'Label("h")', 'Asm("ret",[])',
+		]]
+		chunks = list(stream.chunks(iter(stmts), 3))
+		self.failUnlessEqual([len(chunk) for chunk in chunks], [2, 3, 1, 2])
+		self.failUnlessEqual(sum(chunks, []), stmts)
+		self.failUnlessEqual(list(stream.chunks(iter([]))), [])
+
+	def testTranslate(self):
+		import translate
+		translate.configure()
+		filenames = _examples()
+		self.failUnless(filenames)
+		for filename in filenames:
+			results = []
+			for streamed in (False, True):
+				fpout = StringIO()
+				translate.translate(file(filename, 'rt'), fpout, 0, stream = streamed)
+				results.append(factory.parse(fpout.getvalue()))
+			expected, result = results
+			self.failUnless(result.isEqual(expected), filename)
+
+
+
+class TestBatch(unittest.TestCase):
+
+	def translate(self, jobs):
+		'''Translate two copies of each example in a batch, returning the
+		outputs by file name.'''
+		import sys
+		import translate
+		dirname = tempfile.mkdtemp()
+		try:
+			paths = []
+			for copy in range(2):
+				for filename in _examples():
+					path = os.path.join(dirname, '%d_%s' % (copy, os.path.basename(filename)))
+					shutil.copy(filename, path)
+					paths.append(path)
+			stderr = sys.stderr
+			sys.stderr = StringIO()
+			try:
+				ok = translate.batch(paths, jobs)
+			finally:
+				sys.stderr = stderr
+			self.failUnless(ok)
+			results = {}
+			for path in paths:
+				output = translate.output_name(path)
+				results[os.path.basename(output)] = file(output, 'rt').read()
+			return results
+		finally:
+			shutil.rmtree(dirname)
+
+	def testBatch(self):
+		self.failUnless(_examples())
+		expected = self.translate(1)
+		result = self.translate(2)
+		self.failUnlessEqual(sorted(result.keys()), sorted(expected.keys()))
+		for name in expected:
+			self.failUnlessEqual(result[name], expected[name], name)
+			# later files are not affected by the ones translated before
+			if name.startswith('1_'):
+				self.failUnlessEqual(expected[name], expected['0_' + name[2:]], name)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,416 @@
+'''Hand-written parser for AT&T syntax assembly.
+
+It accepts the same syntax and produces the same terms as the ANTLR parser
+generated from C{att.g}, but tokenizes each line with a single regular
+expression and parses the statements with plain recursive descent, which
+is much faster than the ANTLR runtime. Statements are generated as they are
+read, so that files can be loaded as a stream.
+
+The quirks of the grammar are preserved, namely comments also swallow the
+end of line, and the last statement must be terminated by an end of line.
+'''
+
+
+import re
+
+
+class ParseError(Exception):
+	'''Syntax error in an assembly file.'''
+	pass
+
+
+# token kinds, in the order of the regular expression groups
+DOTSYMBOL, SYMBOL, BINARY, HEXADECIMAL, OCTAL, DECIMAL, STRING, CHAR, COMMENT, EOL, PUNCT = range(1, 12)
+
+# end of file, which is not matched by the regular expression
+EOF = 0
+
+_tokenRe = re.compile(r'''
+	[ \t\f]*
+	(?:
+		(\.[a-zA-Z_.$0-9]*)
+	|
+		([a-zA-Z_][a-zA-Z_.$@0-9]*)
+	|
+		0[bB]([01]*)
+	|
+		0[xX]([0-9a-fA-F]*)
+	|
+		(0[0-9]*)
+	|
+		([1-9][0-9]*)
+	|
+		"((?:[^"\\]|\\(?:[nrtbf"'\\]|[0-3][0-9]{0,2}|[4-7][0-9]?))*)"
+	|
+		('(?:\\(?:[nrtbf"'\\]|[0-3][0-9]{0,2}|[4-7][0-9]?)|[^'])')
+	|
+		(\#[^\r\n]*(?:\r\n?|\n)?)
+	|
+		(\r\n?|\n|;)
+	|
+		([%$,:@()+*-])
+	)
+''', re.VERBOSE)
+
+_spaceRe = re.compile(r'[ \t\f]*')
+
+_escapeRe = re.compile(r'''\\(?:([nrtbf"'\\])|([0-3][0-9]{0,2}|[4-7][0-9]?))''')
+
+_escapes = {
+	'n': '\n',
+	'r': '\r',
+	't': '\t',
+	'b': '\b',
+	'f': '\f',
+	'"': '"',
+	'\'': '\'',
+	'\\': '\\',
+}
+
+def _unescapeRepl(mo):
+	char = mo.group(1)
+	if char is not None:
+		return _escapes[char]
+	return chr(int(mo.group(2), 8))
+
+def _unescape(text):
+	'''Unescape a string literal, exactly like the ANTLR lexer does.'''
+	if '\\' in text:
+		text = _escapeRe.sub(_unescapeRepl, text)
+	return text
+
+
+_integerKinds = (BINARY, HEXADECIMAL, OCTAL, DECIMAL)
+
+_integerFirst = {}
+for _kind in _integerKinds:
+	_integerFirst[_kind] = True
+_integerFirst['-'] = True
+
+_symbolKinds = {DOTSYMBOL: True, SYMBOL: True}
+
+# tokens which may follow the second token of an integer constant
+_integerFollow = _integerFirst.copy()
+_integerFollow.update(_symbolKinds)
+_integerFollow[EOL] = True
+_integerFollow[EOF] = True
+
+_constantFirst = _integerFirst.copy()
+_constantFirst.update(_symbolKinds)
+
+_operandFirst = _constantFirst.copy()
+for _punct in '%$(*':
+	_operandFirst[_punct] = True
+
+# directives which define integer constants, and their sizes
+_integerDirectives = {
+	'.byte': 8,
+	'.word': 16,
+	'.long': 32,
+	'.int': 32,
+	'.quad': 64,
+}
+
+
+def tokenize(fp):
+	'''Generate the tokens of an assembly file, as (kind, text, line)
+	tuples. Punctuation is identified by its character. The last token is
+	always the end of file.'''
+	match = _tokenRe.match
+	lineno = 0
+	buf = ''
+	for line in fp:
+		lineno += 1
+		buf += line
+		pos = 0
+		end = len(buf)
+		while True:
+			pos = _spaceRe.match(buf, pos).end()
+			if pos >= end:
+				buf = ''
+				break
+			mo = match(buf, pos)
+			if mo is None:
+				if buf[pos] == '"':
+					# strings may span several lines
+					buf = buf[pos:]
+					break
+				raise ParseError('unexpected character %r at line %d' % (buf[pos], lineno))
+			kind = mo.lastindex
+			pos = mo.end()
+			if kind == COMMENT:
+				continue
+			if kind == PUNCT:
+				yield mo.group(kind), None, lineno
+			else:
+				yield kind, mo.group(kind), lineno
+	if buf:
+		raise ParseError('unterminated string at line %d' % lineno)
+	yield EOF, None, lineno
+
+
+class Parser(object):
+	'''Parses AT&T syntax assembly statements into low-level IR terms.'''
+
+	def __init__(self, factory, fp):
+		self.factory = factory
+		self.tokens = tokenize(fp)
+		self.counter = 0
+
+		makeAppl = factory.makeAppl
+		self.int32 = makeAppl('Int', [factory.makeInt(32), makeAppl('Signed')])
+		self.plus = makeAppl('Plus', [self.int32])
+		self.regAnnos = factory.makeList([makeAppl('Reg')])
+
+	def _error(self, toks, i, expected):
+		kind, text, lineno = toks[i]
+		if kind == EOF:
+			found = 'end of file'
+		elif kind == EOL:
+			found = 'end of line'
+		elif text is None:
+			found = repr(kind)
+		else:
+			found = repr(text)
+		return ParseError('expected %s, found %s at line %d' % (expected, found, lineno))
+
+	def statements(self):
+		'''Generate the statements of the input.'''
+		toks = []
+		for tok in self.tokens:
+			toks.append(tok)
+			kind = tok[0]
+			if kind == EOL:
+				for stmt in self.statement(toks):
+					yield stmt
+				toks = []
+			elif kind == EOF:
+				if len(toks) > 1:
+					# the last statement lacks an end of line
+					self.statement(toks)
+				break
+
+	def start(self):
+		'''Parse the whole input into a module.'''
+		factory = self.factory
+		stmts = list(self.statements())
+		return factory.makeAppl('Module', [factory.makeList(stmts)])
+
+	def statement(self, toks):
+		'''Parse the tokens of a statement, which end with an end of line.'''
+		res = []
+		i = 0
+		makeAppl = self.factory.makeAppl
+		makeStr = self.factory.makeStr
+
+		# labels
+		while toks[i][0] in _symbolKinds and toks[i + 1][0] == ':':
+			res.append(makeAppl('Label', [makeStr(toks[i][1])]))
+			i += 2
+
+		kind = toks[i][0]
+		if kind == DOTSYMBOL:
+			i = self.directive(toks, i, res)
+		elif kind == SYMBOL:
+			i = self.prefixedInstruction(toks, i, res)
+
+		if toks[i][0] != EOL:
+			raise self._error(toks, i, 'end of line')
+		return res
+
+	def _dataConstant(self, type, prefix, value):
+		factory = self.factory
+		self.counter += 1
+		name = prefix + str(self.counter)
+		return factory.makeAppl('Var', [
+			type,
+			factory.makeStr(name),
+			factory.makeAppl('Lit', [type, value]),
+		])
+
+	def directive(self, toks, i, res):
+		factory = self.factory
+		directive = toks[i][1]
+		i += 1
+		# like the generated parser, only take the constant when the
+		# lookahead is consistent with a single constant per statement
+		if directive in _integerDirectives:
+			if toks[i][0] in _integerFirst and (
+				toks[i + 1][0] == EOL or
+				toks[i + 1][0] in _integerFirst and toks[i + 2][0] in _integerFollow
+			):
+				value, i = self.integer(toks, i)
+				type = factory.makeAppl('Int', [
+					factory.makeInt(_integerDirectives[directive]),
+					factory.makeAppl('NoSign'),
+				])
+				res.append(self._dataConstant(type, 'i_', factory.makeInt(value)))
+				return i
+		elif directive == '.ascii':
+			if toks[i][0] == STRING and toks[i + 1][0] == EOL:
+				type = factory.makeAppl('Pointer', [
+					factory.makeAppl('Char', [factory.makeInt(8)]),
+				])
+				value = factory.makeStr(_unescape(toks[i][1]))
+				res.append(self._dataConstant(type, 's_', value))
+				return i + 1
+		# FIXME: Do not ignore directives
+		while toks[i][0] != EOL and toks[i][0] != EOF:
+			i += 1
+		return i
+
+	def prefixedInstruction(self, toks, i, res):
+		try:
+			insn, i = self.instruction(toks, i)
+		except ParseError:
+			# FIXME: Do not ignore instruction prefixes
+			if toks[i + 1][0] != SYMBOL:
+				raise
+			insn, i = self.instruction(toks, i + 1)
+		res.append(insn)
+		return i
+
+	def instruction(self, toks, i):
+		factory = self.factory
+		opcode = toks[i][1]
+		i += 1
+		operands = []
+		if toks[i][0] in _operandFirst:
+			operand, i = self.operand(toks, i)
+			operands.append(operand)
+			while toks[i][0] == ',':
+				operand, i = self.operand(toks, i + 1)
+				operands.append(operand)
+		# reverse operands to intel syntax
+		if len(operands) == 2:
+			operands.reverse()
+		return factory.makeAppl('Asm', [
+			factory.makeStr(opcode.lower()),
+			factory.makeList(operands),
+		]), i
+
+	def _isRegister(self, toks, i):
+		return (
+			toks[i][0] == '%' and
+			toks[i + 1][0] in _symbolKinds and
+			toks[i + 2][0] != ':'
+		)
+
+	def operand(self, toks, i):
+		kind = toks[i][0]
+		if kind == '%' and self._isRegister(toks, i):
+			return self.register(toks, i)
+		elif kind == '$':
+			return self.constant(toks, i + 1)
+		elif kind == '*':
+			if self._isRegister(toks, i + 1):
+				reg, i = self.register(toks, i + 1)
+				return self.factory.makeAppl('Ref', [reg]), i
+			return self.memory(toks, i + 1)
+		else:
+			return self.memory(toks, i)
+
+	def register(self, toks, i):
+		if toks[i][0] != '%':
+			raise self._error(toks, i, 'register')
+		if toks[i + 1][0] not in _symbolKinds:
+			raise self._error(toks, i + 1, 'register name')
+		factory = self.factory
+		reg = factory.makeAppl('Sym', [factory.makeStr(toks[i + 1][1])], self.regAnnos)
+		return reg, i + 2
+
+	def memory(self, toks, i):
+		factory = self.factory
+		disp = None
+		base = None
+		if toks[i][0] == '%':
+			# XXX: section is ignored
+			section, i = self.register(toks, i)
+			if toks[i][0] != ':':
+				raise self._error(toks, i, '":"')
+			i += 1
+		kind = toks[i][0]
+		if kind in _constantFirst:
+			disp, i = self.constant(toks, i)
+			if toks[i][0] == '(':
+				base, i = self.memoryBase(toks, i)
+		elif kind == '(':
+			base, i = self.memoryBase(toks, i)
+		else:
+			raise self._error(toks, i, 'memory operand')
+
+		if base is None:
+			addr = disp
+		elif disp is None:
+			addr = base
+		else:
+			addr = factory.makeAppl('Binary', [self.plus, base, disp])
+		if addr is None:
+			raise self._error(toks, i - 1, 'memory address')
+		return factory.makeAppl('Ref', [addr]), i
+
+	def memoryBase(self, toks, i):
+		factory = self.factory
+		base = None
+		index = None
+		scale = 1
+		i += 1
+		if toks[i][0] == '%':
+			base, i = self.register(toks, i)
+		if toks[i][0] == ',':
+			i += 1
+			if toks[i][0] == '%':
+				index, i = self.register(toks, i)
+			if toks[i][0] == ',':
+				i += 1
+				if toks[i][0] in _integerFirst:
+					scale, i = self.integer(toks, i)
+		if toks[i][0] != ')':
+			raise self._error(toks, i, '")"')
+		i += 1
+
+		if not index is None and scale != 1:
+			scale = factory.makeAppl('Lit', [self.int32, factory.makeInt(scale)])
+			index = factory.makeAppl('Binary', [self.plus, index, scale])
+		if base is None:
+			return index, i
+		elif index is None:
+			return base, i
+		else:
+			return factory.makeAppl('Binary', [self.plus, base, index]), i
+
+	def constant(self, toks, i):
+		factory = self.factory
+		kind = toks[i][0]
+		if kind in _symbolKinds:
+			return factory.makeAppl('Sym', [factory.makeStr(toks[i][1])]), i + 1
+		value, i = self.integer(toks, i)
+		return factory.makeAppl('Lit', [self.int32, factory.makeInt(value)]), i
+
+	def integer(self, toks, i):
+		negate = False
+		while toks[i][0] == '-':
+			negate = not negate
+			i += 1
+		kind, text, lineno = toks[i]
+		if kind == DECIMAL:
+			value = int(text)
+		elif kind == HEXADECIMAL:
+			value = int(text, 16)
+		elif kind == OCTAL:
+			value = int(text, 8)
+		elif kind == BINARY:
+			# the generated lexer drops the 'b' from the token text, and the
+			# parser then skips two characters, i.e., the first digit too
+			value = int(text[1:], 2)
+		else:
+			raise self._error(toks, i, 'integer')
+		if negate:
+			value = -value
+		return value, i + 1
+
+
+def parse(factory, fp):
+	'''Parse an assembly file into a module term.'''
+	parser = Parser(factory, fp)
+	return parser.start()
@@ -0,0 +1,194 @@
+'''Parallel translation of modules.
+
+The statements of a module are translated independently of each other, so a
+module can be split in chunks at function boundaries, which are translated by
+a pool of worker processes and then merged in order.
+
+The only state shared between statements is the counter of the temporary
+variables (see L{machine.pentium.common.Temp}). Each chunk is translated with
+the counter starting at zero, and its temporaries are renumbered afterwards,
+so that the result is identical to translating the whole module serially.
+
+Terms are passed to and from the workers in the binary format.
+'''
+
+
+import sys
+from cStringIO import StringIO
+
+try:
+	import multiprocessing
+except ImportError:
+	multiprocessing = None
+
+import aterm.types
+
+
+# modules with fewer statements are translated serially
+MIN_PARALLEL_STMTS = 2048
+
+# number of chunks per worker, to balance the load
+CHUNKS_PER_JOB = 4
+
+
+def _dumps(term):
+	fp = StringIO()
+	term.writeToBinaryFile(fp)
+	return fp.getvalue()
+
+
+def _loads(factory, buf):
+	return factory.readFromBinaryFile(StringIO(buf))
+
+
+def isFunctionStart(stmt):
+	'''Whether a statement starts a function, i.e., is a global label.'''
+	return (
+		stmt.type == aterm.types.APPL and
+		stmt.name == 'Label' and
+		not stmt.args[0].value.startswith('.')
+	)
+
+
+def split(stmts, chunks):
+	'''Split a statement list in about the given number of chunks of similar
+	size, at function boundaries.'''
+	stmts = list(stmts)
+	size = max(1, (len(stmts) + chunks - 1) // chunks)
+	result = []
+	current = []
+	for stmt in stmts:
+		if len(current) >= size and isFunctionStart(stmt):
+			result.append(current)
+			current = []
+		current.append(stmt)
+	if current:
+		result.append(current)
+	return result
+
+
+def _isTemp(term):
+	if term.name != 'Sym' or len(term.args) != 1:
+		return False
+	for anno in term.annotations:
+		if anno.type == aterm.types.APPL and anno.name == 'Tmp':
+			return True
+	return False
+
+
+def _children(term):
+	type = term.type
+	if type == aterm.types.APPL:
+		if _isTemp(term):
+			return ()
+		return list(term.args) + [term.annotations]
+	if type == aterm.types.CONS:
+		return list(term)
+	return ()
+
+
+def _renumbered(term, offset, memo):
+	'''Rebuild a term from its renumbered children.'''
+	factory = term.factory
+	type = term.type
+	if type == aterm.types.APPL:
+		if _isTemp(term):
+			number = int(term.args[0].value[len('tmp'):])
+			name = factory.makeStr('tmp%d' % (number + offset))
+			return factory.makeAppl('Sym', [name], term.annotations)
+		args = [memo[id(arg)] for arg in term.args]
+		annos = memo[id(term.annotations)]
+		if annos is not term.annotations:
+			return factory.makeAppl(term.name, args, annos)
+		for old, new in zip(term.args, args):
+			if old is not new:
+				return factory.makeAppl(term.name, args, annos)
+	elif type == aterm.types.CONS:
+		elms = list(term)
+		newElms = [memo[id(elm)] for elm in elms]
+		for old, new in zip(elms, newElms):
+			if old is not new:
+				return factory.makeList(newElms)
+	return term
+
+
+def renumber(term, offset):
+	'''Offset the numbers of the temporary variables in a term.'''
+	# subterms are visited iteratively, in post-order, so that deeply nested
+	# terms do not exhaust the stack
+	memo = {}
+	stack = [(term, False)]
+	while stack:
+		subterm, visited = stack.pop()
+		if id(subterm) in memo:
+			continue
+		if not visited:
+			children = _children(subterm)
+			if children:
+				stack.append((subterm, True))
+				for child in children:
+					if id(child) not in memo:
+						stack.append((child, False))
+				continue
+		memo[id(subterm)] = _renumbered(subterm, offset, memo)
+	return memo[id(term)]
+
+
+def _translateChunk(buf):
+	'''Translate a chunk of statements in a worker process.'''
+	from aterm.factory import factory
+	from transf.context import Context
+	from machine.pentium import translator
+	from machine.pentium import common
+
+	stmts = _loads(factory, buf)
+	common.temp.tmp_no = 0
+	stmts = translator.doStmts.apply(stmts, Context())
+	return _dumps(stmts), common.temp.tmp_no
+
+
+def translate(term, jobs):
+	'''Translate a module using the given number of worker processes.'''
+	from transf.context import Context
+	from machine.pentium import translator
+	from machine.pentium import common
+
+	factory = term.factory
+	if jobs <= 1:
+		return translator.doModule.apply(term, Context())
+	if multiprocessing is None:
+		reason = 'multiprocessing is not available'
+	elif (
+		term.type != aterm.types.APPL or
+		term.name != 'Module' or
+		len(term.args) != 1
+	):
+		reason = 'not a module'
+	elif len(term.args[0]) < MIN_PARALLEL_STMTS:
+		reason = 'only %d statements, fewer than %d' % (len(term.args[0]), MIN_PARALLEL_STMTS)
+	else:
+		reason = None
+	if reason is not None:
+		sys.stderr.write('translating serially: %s\n' % reason)
+		return translator.doModule.apply(term, Context())
+
+	chunks = split(term.args[0], jobs*CHUNKS_PER_JOB)
+	bufs = [_dumps(factory.makeList(chunk)) for chunk in chunks]
+	pool = multiprocessing.Pool(jobs)
+	try:
+		results = pool.map(_translateChunk, bufs)
+	finally:
+		pool.close()
+		pool.join()
+
+	offset = common.temp.tmp_no
+	stmts = []
+	for buf, count in results:
+		chunk = _loads(factory, buf)
+		if offset:
+			chunk = renumber(chunk, offset)
+		stmts.extend(chunk)
+		offset += count
+	common.temp.tmp_no = offset
+
+	return factory.makeAppl('Module', [factory.makeList(stmts)], term.annotations)
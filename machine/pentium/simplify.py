@@ -2,6 +2,8 @@
 
 
 from transf import parse
+from transf.lib import traverse
+from transf.lib import memo
 from machine.pentium.common import *
 
 
@@ -35,14 +37,19 @@ simplifyStmt =
 		-> expr
 
 
-simplify =
-	traverse.InnerMost(
-		simplifyExpr +
-		simplifyStmt
-	)
+simplifyRules =
+	simplifyExpr +
+	simplifyStmt
 
 
 ''')
 
 
+# the same operands and addresses recur across statements, so the rules are
+# memoized structurally
+simplify = traverse.Normalize(
+	memo.Memo(simplifyRules, structural = True, name = 'pentium.simplify')
+)
+
+
 
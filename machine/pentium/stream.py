@@ -0,0 +1,58 @@
+'''Streaming translation of modules.
+
+Statements are generated by the parser as they are read, gathered in chunks
+at function boundaries, translated and generated again, so that loading,
+translation and writing can be chained in a pipeline whose memory use does
+not depend on the size of the input.
+
+Statements are translated independently of each other, and the counter of
+the temporary variables is carried along from one chunk to the next, so that
+the result is identical to translating the whole module at once.
+'''
+
+
+from machine.pentium import parallel
+
+
+# maximum number of statements translated at once
+CHUNK_STMTS = 512
+
+
+def load(factory, fp):
+	'''Generate the statements of an assembly file as they are parsed by the
+	ANTLR parser.'''
+	import antlr
+	from machine.pentium.att_lexer import Lexer
+	from machine.pentium.att_parser import Parser
+
+	lexer = Lexer(fp)
+	parser = Parser(lexer, factory = factory)
+	# parse statement by statement, instead of the whole module with
+	# parser.start(), so that only the current statement is kept
+	while parser.LA(1) != antlr.EOF:
+		for stmt in parser.statement():
+			yield stmt
+
+
+def chunks(stmts, size = CHUNK_STMTS):
+	'''Gather statements in chunks, which end before a function start or
+	when reaching the given size.'''
+	chunk = []
+	for stmt in stmts:
+		if chunk and (len(chunk) >= size or parallel.isFunctionStart(stmt)):
+			yield chunk
+			chunk = []
+		chunk.append(stmt)
+	if chunk:
+		yield chunk
+
+
+def translate(factory, stmts, size = CHUNK_STMTS):
+	'''Generate the translation of a sequence of statements.'''
+	from transf.context import Context
+	from machine.pentium import translator
+
+	doStmts = translator.doStmts
+	for chunk in chunks(stmts, size):
+		for stmt in doStmts.apply(factory.makeList(chunk), Context()):
+			yield stmt
@@ -4,6 +4,8 @@
 import sys
 import traceback
 
+import aterm.types
+
 from transf import transformation
 from transf import parse
 
@@ -22,27 +24,50 @@ from machine.pentium.simplify import simplify
 
 class OpcodeDispatch(transformation.Transformation):
 	"""Transformation to quickly dispatch the transformation to the appropriate
-	transformation."""
+	transformation.
+
+	The transformation of each opcode is looked up in a table, built once from
+	the C{asmXXX} transformations of the given namespace (this module's by
+	default).
+	"""
+
+	__slots__ = ['table']
+
+	# whether to validate every translated statement; can be disabled in
+	# production runs
+	check = True
+
+	def __init__(self, namespace = None):
+		transformation.Transformation.__init__(self)
+		if namespace is None:
+			namespace = globals()
+		self.table = {}
+		for name, value in namespace.iteritems():
+			if name.startswith('asm') and name[3:].isupper() and hasattr(value, 'apply'):
+				self.table[name[3:]] = value
 
 	def apply(self, trm, ctx):
-		if not trm.rmatch('Asm(_, [*])'):
+		# same as matching 'Asm(_, [*])', but without the matching machinery
+		if trm.type != aterm.types.APPL or trm.name != 'Asm' or len(trm.args) != 2:
 			raise exception.Failure
-
 		opcode, operands = trm.args
+		if not aterm.types.isList(operands):
+			raise exception.Failure
 
 		opcode = opcode.value
 		try:
-			trf = eval("asm" + opcode.upper())
-		except NameError:
+			trf = self.table[opcode.upper()]
+		except KeyError:
 			sys.stderr.write("warning: don't now how to translate opcode '%s'\n" % opcode)
 			raise exception.Failure
 
 		try:
 			trm = trf.apply(operands, ctx)
-			for stmt in trm:
-				ir.check.stmt(stmt)
+			if self.check:
+				for stmt in trm:
+					ir.check.stmt(stmt)
 			return trm
-		except KeyboardInterrupt, SystemExit:
+		except (KeyboardInterrupt, SystemExit):
 			raise
 		except:
 			sys.stderr.write("warning: failed to translate opcode '%s'\n" % opcode)
@@ -57,8 +82,12 @@ doStmt =
 	+ ![<id>]
 
 
+doStmts =
+	lists.MapConcat(doStmt)
+
+
 doModule =
-	~Module(<lists.MapConcat(doStmt)>)
+	~Module(<doStmts>)
 
 
 ''')
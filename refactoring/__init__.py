@@ -6,9 +6,14 @@ import sys
 import unittest
 
 import aterm.path
+import aterm.cache
 import transf.exception
 
 
+# maximum number of selections whose applicable refactorings are remembered
+MAX_APPLICABLE_SELECTIONS = 64
+
+
 class Refactoring:
 	"""Abstract base class for refactorings."""
 
@@ -58,8 +63,12 @@ class ModuleRefactoring(Refactoring):
 	def applicable(self, trm, selection):
 		factory = trm.factory
 		selection = self._selection(selection)
-		ctx = transf.context.Context()
 		trm = factory.makeList([trm, selection])
+		return self._applies(trm)
+
+	def _applies(self, trm):
+		"""Whether applicable to the [term, selection] pair."""
+		ctx = transf.context.Context()
 		try:
 			self._applicable.apply(trm, ctx)
 		except transf.exception.Failure:
@@ -97,6 +106,7 @@ class Factory:
 
 	def load(self):
 		self.refactorings = {}
+		self.invalidate()
 		for path in __path__:
 			for name in os.listdir(path):
 				name, ext = os.path.splitext(name)
@@ -118,12 +128,59 @@ class Factory:
 					else:
 						self.refactorings[refactoring.name()] = refactoring
 
+	def invalidate(self):
+		"""Forget the applicability of the refactorings."""
+		self._term = None
+		self._applicability = aterm.cache.LRUCache(MAX_APPLICABLE_SELECTIONS)
+
+	def applicability(self, term, selection):
+		"""Return a dictionary telling whether each refactoring, indexed by
+		name, is applicable to the given term and selection.
+
+		All refactorings are checked in one pass, sharing the selection
+		path. The results are remembered for the selections of the last
+		term, which is compared by identity, so the checks are only
+		done again after the term changes.
+		"""
+		if term is not self._term:
+			self.invalidate()
+			self._term = term
+		start, end = selection
+		try:
+			return self._applicability[start, end]
+		except KeyError:
+			pass
+		# refactorings with module of their own compute the selection path
+		# identically, so do it once for all
+		pair = None
+		result = {}
+		for name, refactoring in self.refactorings.iteritems():
+			if isinstance(refactoring, ModuleRefactoring):
+				if pair is None:
+					pair = term.factory.makeList([term, refactoring._selection(selection)])
+				result[name] = refactoring._applies(pair)
+			else:
+				result[name] = refactoring.applicable(term, selection)
+		# only cached when all checks completed, so that errors are raised
+		# again instead of being remembered
+		self._applicability[start, end] = result
+		return result
+
+	def is_applicable(self, refactoring, term, selection):
+		"""Whether a refactoring is applicable to the given term and selection,
+		as remembered by L{applicability}."""
+		try:
+			return self.applicability(term, selection)[refactoring.name()]
+		except KeyError:
+			return refactoring.applicable(term, selection)
+
 	def applicables(self, term, selection):
 		"""Enumerate the applicable refactorings to the given term and
 		selection context.
 		"""
-		for refactoring in self.refactorings.itervalues():
-			if refactoring.applicable(term, selection):
+		applicability = self.applicability(term, selection)
+		for name, refactoring in self.refactorings.iteritems():
+			if applicability[name]:
 				yield refactoring
 		raise StopIteration
 
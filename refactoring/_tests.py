@@ -29,10 +29,79 @@ class TransformationTest(unittest.TestCase):
 		return self.__transfName
 
 
+class TestFactory(unittest.TestCase):
+	'''Test the applicability cache with stub refactorings.'''
+
+	class Stub(refactoring.Refactoring):
+
+		def __init__(self, name, applicable):
+			refactoring.Refactoring.__init__(self)
+			self._name = name
+			self._applicable = applicable
+			self.checks = 0
+
+		def name(self):
+			return self._name
+
+		def applicable(self, term, selection):
+			self.checks += 1
+			return self._applicable(term, selection)
+
+	class Factory(refactoring.Factory):
+
+		def load(self):
+			self.refactorings = {}
+			self.invalidate()
+
+	def broken(self, term, selection):
+		raise ValueError
+
+	def setUp(self):
+		self.factory = self.Factory()
+		self.yes = self.Stub('yes', lambda term, selection: True)
+		self.no = self.Stub('no', lambda term, selection: False)
+		for stub in (self.yes, self.no):
+			self.factory.refactorings[stub.name()] = stub
+		parse = aterm.factory.factory.parse
+		self.term = parse('Module([A,B])')
+		self.selection = parse('[0,0]'), parse('[0,0]')
+		self.other = parse('[1,0]'), parse('[1,0]')
+
+	def testApplicables(self):
+		result = list(self.factory.applicables(self.term, self.selection))
+		self.failUnlessEqual(result, [self.yes])
+
+	def testCache(self):
+		factory = self.factory
+		for i in range(3):
+			self.failUnless(factory.is_applicable(self.yes, self.term, self.selection))
+			self.failIf(factory.is_applicable(self.no, self.term, self.selection))
+		self.failUnlessEqual(self.yes.checks, 1)
+		self.failUnlessEqual(self.no.checks, 1)
+		factory.is_applicable(self.yes, self.term, self.other)
+		self.failUnlessEqual(self.yes.checks, 2)
+		# a different term invalidates the cache
+		term = aterm.factory.factory.parse('Module([A,C])')
+		factory.is_applicable(self.yes, term, self.selection)
+		self.failUnlessEqual(self.yes.checks, 3)
+		factory.invalidate()
+		factory.is_applicable(self.yes, term, self.selection)
+		self.failUnlessEqual(self.yes.checks, 4)
+
+	def testBroken(self):
+		# errors other than failures are not hidden, nor cached
+		bad = self.Stub('bad', self.broken)
+		self.factory.refactorings[bad.name()] = bad
+		for i in range(2):
+			self.failUnlessRaises(ValueError, self.factory.applicability, self.term, self.selection)
+		self.failUnlessEqual(bad.checks, 2)
+
+
 class RefactoringTestSuite(unittest.TestSuite):
 
 	def __init__(self):
 		unittest.TestSuite.__init__(self)
+		self.addTest(unittest.makeSuite(TestFactory))
 
 		for name in os.listdir(refactoring.__path__[0]):
 			name, ext = os.path.splitext(name)
@@ -89,6 +89,11 @@ dle =
 		dleModule
 	}
 
+# Eliminate the dead labels of either a single function or a whole module
+dleLocal =
+	?Function & dleFunction +
+	dle
+
 
 testUnusedLabel =
     !Module([
@@ -97,6 +102,17 @@ testUnusedLabel =
     dle ;
     ?Module([])
 
+testFunction =
+    !Module([
+    	Function(Void, "f", [], [
+    		Label("A")
+    	])
+    ]) ;
+    OnceTD(?Function ; dleLocal) ;
+    ?Module([
+    	Function(Void, "f", [], [])
+    ])
+
 testUsedLabel =
     !Module([
     	GoTo(Sym("A")),
@@ -29,12 +29,9 @@ input =
 	)
 
 apply =
-	ir.path.Apply(
+	ir.path.ApplySelected(
 		[root,[]] -> root ;
-		OnceTD(
-			ir.path.isSelected ;
-			InnerMost(simplify)
-		)
+		Normalize(simplify)
 	)
 
 
@@ -2,7 +2,7 @@
 
 
 import refactoring
-from refactoring.dead_label_elimination import dle
+from refactoring.dead_label_elimination import dleLocal
 
 from transf import parse
 import ir.path
@@ -43,10 +43,10 @@ input =
 
 
 apply =
-	ir.path.Apply(
+	ir.path.ApplyInFunction(
 		[root,[]] -> root ;
 		common ;
-		dle
+		dleLocal
 	)
 
 
@@ -1,7 +1,7 @@
 """Structure If"""
 
 
-from refactoring.dead_label_elimination import dle
+from refactoring.dead_label_elimination import dleLocal
 
 from transf import parse
 import ir.path
@@ -46,10 +46,10 @@ input =
 	)
 
 apply =
-	ir.path.Apply(
+	ir.path.ApplyInFunction(
 		[root,[]] -> root ;
 		common ;
-		dle
+		dleLocal
 	)
 
 ''')
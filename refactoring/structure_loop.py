@@ -2,7 +2,7 @@
 
 
 import refactoring
-from refactoring.dead_label_elimination import dle
+from refactoring.dead_label_elimination import dleLocal
 
 from transf import parse
 import ir.path
@@ -51,10 +51,10 @@ input =
 	)
 
 apply =
-	ir.path.Apply(
+	ir.path.ApplyInFunction(
 		[root,[]] -> root ;
 		common ;
-		dle
+		dleLocal
 	)
 
 
@@ -72,4 +72,22 @@ testApply =
 		)
 	])
 
+testApplyInFunction =
+	!Module([
+		Function(Void, "f", [], [
+			Label("next"),
+			Assign(Int(32,Signed), Sym("a"), Sym("b")),
+			GoTo(Sym("next"))
+		])
+	]) ;
+	ir.path.annotate ;
+	apply [<id>, [[2,3,0,0]]] ;
+	?Module([
+		Function(Void, "f", [], [
+			While(Lit(Bool,1),
+				Assign(Int(32,Signed), Sym("a"), Sym("b"))
+			)
+		])
+	])
+
 ''')
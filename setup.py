@@ -146,6 +146,8 @@ def test():
 			"box._tests",
 			"ir._tests",
 			"refactoring._tests.RefactoringTestSuite",
+			"machine.pentium._tests",
+			"ui._tests",
 		]
 	for name in names:
 		test = testLoader.loadTestsFromName(name)
@@ -156,6 +158,12 @@ def test():
 
 
 
+def bench():
+	"""Run the benchmarks."""
+	from aterm import _bench
+	_bench.main(sys.argv[1:])
+
+
 def doc():
 	modules = [
 		'aterm',
@@ -229,6 +237,7 @@ def main():
 		sys.stderr.write("  %s build\n" % sys.argv[0])
 		sys.stderr.write("  %s clean\n" % sys.argv[0])
 		sys.stderr.write("  %s test\n" % sys.argv[0])
+		sys.stderr.write("  %s bench\n" % sys.argv[0])
 		sys.exit(1)
 	try:
 		func = globals()[command]
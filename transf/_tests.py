@@ -2,6 +2,9 @@
 '''Unit tests for the transformation package.'''
 
 
+import os
+import shutil
+import tempfile
 import unittest
 
 import antlr
@@ -9,6 +12,7 @@ import antlr
 import aterm.factory
 
 from transf import transformation
+from transf import context
 from transf import parse
 from transf.lib import *
 from transf.lib.base import ident, fail
@@ -318,6 +322,28 @@ class TestTraverse(TestMixin, unittest.TestCase):
 
 	# TODO: testInnerMost
 
+	normalizeTestCases = [
+		'1', 'Z', 'A(Z,Z)', 'A(S(Z),S(S(Z)))', 'N(N(N(A(Z,S(Z)))))',
+		'[A(S(Z),Z),N(N(Z)),[Z,A(Z,Z)]]', 'A(S(S(Z)),A(S(Z),N(N(Z)))){X}',
+	]
+
+	def testNormalize(self):
+		rules = Rule('''
+			A(x, Z) -> x
+		+	A(Z, x) -> x
+		+	A(S(x), y) -> S(A(x, y))
+		+	N(N(x)) -> x
+		''')
+		innermost = traverse.InnerMost(rules)
+		normalize = traverse.Normalize(rules)
+		for termStr in self.normalizeTestCases:
+			term = self.factory.parse(termStr)
+			expectedResult = innermost(term)
+			result = normalize(term)
+			self.failUnless(expectedResult.isEqual(result),
+				msg = "%s -> %s (!= %s)" % (term, result, expectedResult)
+			)
+
 
 class TestProject(TestMixin, unittest.TestCase):
 
@@ -444,6 +470,74 @@ class TestArith(TestMixin, unittest.TestCase):
 		)
 
 
+class TestMemo(TestMixin, unittest.TestCase):
+
+	memoTestCases = (
+		('C(1)', 'X(1)'),
+		('C(1)', 'X(1)'),
+		('C(1){A}', 'X(1)'),
+		('D', 'FAILURE'),
+		('D', 'FAILURE'),
+	)
+
+	def testMemo(self):
+		self._testTransf(memo.Memo(Rule('C(x) -> X(x)')), self.memoTestCases)
+		self._testTransf(memo.Memo(Rule('C(x) -> X(x)'), structural = True), self.memoTestCases)
+
+	def testHits(self):
+		transf = memo.Memo(Rule('C(x) -> X(x)'), name = 'hits')
+		term = self.factory.parse('C(1)')
+		for i in range(3):
+			transf(term)
+		stats = transf.stats()
+		self.failUnlessEqual(stats['hits'], 2)
+		self.failUnlessEqual(stats['misses'], 1)
+		self.failUnless(stats['pure'])
+		self.failUnless('hits' in memo.getStats())
+
+	def testStructural(self):
+		transf = memo.Memo(Rule('C(x) -> X(x)'), structural = True)
+		transf(self.factory.parse('C(1)'))
+		transf(self.factory.parse('C(1)'))
+		self.failUnlessEqual(transf.stats()['hits'], 1)
+		transf(self.factory.parse('C(1){A}'))
+		self.failUnlessEqual(transf.stats()['hits'], 1)
+
+	def testImpure(self):
+		from transf.types import term
+		x = term.Term('x')
+		transf = memo.Memo(x.build)
+		ctx = context.Context([(x.binding.name, self.factory.parse('X'))])
+		for i in range(2):
+			result = transf.apply(self.factory.parse('C'), ctx)
+			self.failUnless(result.isEqual(self.factory.parse('X')))
+		self.failIf(transf.stats()['pure'])
+		self.failUnlessEqual(transf.stats()['hits'], 0)
+
+	class Swallow(transformation.Transformation):
+		'''Turn any exception into a failure.'''
+
+		def __init__(self, operand):
+			transformation.Transformation.__init__(self)
+			self.operand = operand
+
+		def apply(self, trm, ctx):
+			try:
+				return self.operand.apply(trm, ctx)
+			except:
+				raise exception.Failure
+
+	def testImpureSwallowed(self):
+		from transf.types import term
+		x = term.Term('x')
+		transf = memo.Memo(self.Swallow(x.build))
+		ctx = context.Context([(x.binding.name, self.factory.parse('X'))])
+		for i in range(2):
+			result = transf.apply(self.factory.parse('C'), ctx)
+			self.failUnless(result.isEqual(self.factory.parse('X')))
+		self.failIf(transf.stats()['pure'])
+
+
 class TestParse(TestMixin, unittest.TestCase):
 
 	parseTestCases = [
@@ -553,6 +647,95 @@ class TestParse(TestMixin, unittest.TestCase):
 			)
 
 
+class TestParseCache(TestMixin, unittest.TestCase):
+
+	def setUp(self):
+		TestMixin.setUp(self)
+		self.directory = parse.cache.directory
+		parse.cache.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(parse.cache.directory, ignore_errors=True)
+		parse.cache.directory = self.directory
+
+	def testKey(self):
+		key = parse.cache.make_key('id', True, False)
+		self.failUnlessEqual(key, parse.cache.make_key('id', True, False))
+		self.failIfEqual(key, parse.cache.make_key('fail', True, False))
+		self.failIfEqual(key, parse.cache.make_key('id', True, True))
+
+	def testStore(self):
+		key = parse.cache.make_key('x = 1')
+		self.failUnless(parse.cache.load(key) is None)
+		parse.cache.store(key, compile('x = 1', '<transf>', 'exec'))
+		namespace = {}
+		exec parse.cache.load(key) in namespace
+		self.failUnlessEqual(namespace['x'], 1)
+
+	def testTransf(self):
+		self._testTransf(Transf('?C(x) ; !D(x)'), [('C(1)', 'D(1)'), ('C', 'FAILURE')])
+		self.failUnlessEqual(len(os.listdir(parse.cache.directory)), 1)
+		# a second time should come from the cache
+		self._testTransf(Transf('?C(x) ; !D(x)'), [('C(1)', 'D(1)'), ('C', 'FAILURE')])
+		self.failUnlessEqual(len(os.listdir(parse.cache.directory)), 1)
+
+
+class TestSimplifier(TestMixin, unittest.TestCase):
+	'''Compare the indexed choices with the original ones.'''
+
+	transfTestCases = [
+		'C(x) -> x + C(x,y) -> P(y,x) + D(x) -> 4 + ?C ; !"c" + 1 -> 10',
+		'C(x) -> x | D(x,y) -> y | ?z | E(x,y) -> y | C(x,y) -> y | !"default"',
+		'C(x) -> x + {x: D(x,_) -> x} + E(x,y) -> C(_) if !x + ?F & !"f" + ?G() + [] -> "nil" + "a" -> "A"',
+		'C(x) -> x + C(1,x) -> x + (D(x) -> 4 + F(_,_,x) -> x) + fail + C(a,b) -> a',
+		'?C(x) ; !x + ?C(x,1) ; !x + ?D(x) ; !x + ?D(1,x) ; !x',
+		'1 -> 10 + 2 -> 20 + C(x) -> x',
+	]
+
+	inputs = TestMixin.termInputs + [
+		'C(1,1)', 'C(1,2)', 'C{A}', 'D(1)', 'D(1,[2,3])', 'F(1,2,3)', 'G', 'E(C(1),C(2))',
+	]
+
+	def testIndex(self):
+		from transf.parse import simplifier
+		for buf in self.transfTestCases[:-1]:
+			term = simplifier.simplify(parse._parse('f = ' + buf))
+			self.failUnless('Index' in str(term), msg = buf)
+		term = simplifier.simplify(parse._parse('f = ' + self.transfTestCases[-1]))
+		self.failIf('Index' in str(term))
+		# the alternatives which apply to any term are not duplicated
+		term = simplifier.simplify(parse._parse('f = ' + self.transfTestCases[1]))
+		self.failUnlessEqual(str(term).count('"default"'), 1)
+
+	def testSimplifier(self):
+		from transf.parse.compiler import Compiler
+		from transf.parse import simplifier
+		for buf in self.transfTestCases:
+			defs = parse._parse('f = ' + buf)
+			original = self._load(Compiler, defs)['f']
+			indexed = self._load(Compiler, simplifier.simplify(defs))['f']
+			for termStr in self.inputs:
+				term = self.factory.parse(termStr)
+				expectedResult = self._apply(original, term)
+				result = self._apply(indexed, term)
+				self.failUnless(expectedResult.isEqual(result),
+					msg = "%s: %s -> %s (!= %s)" % (buf, term, result, expectedResult)
+				)
+
+	def _load(self, Compiler, defs):
+		from transf.parse import _builtins
+		code = Compiler().definitions(defs)
+		namespace = {'__builtins__': _builtins}
+		exec code in namespace
+		return namespace
+
+	def _apply(self, transf, term):
+		try:
+			return transf(term)
+		except exception.Failure:
+			return self.factory.parse('FAILURE')
+
+
 class TestPath(TestMixin, unittest.TestCase):
 
 	def testAnnotate(self):
@@ -617,6 +800,26 @@ class TestPath(TestMixin, unittest.TestCase):
 			self.pathTestCases
 		)
 
+	localTestCases = [
+		('1', '[]', 'X(1)'),
+		('[1,2]', '[1]', 'X([1,2])'),
+		('C(1,2)', '[0]', 'X(C(1,2))'),
+		('A(C(1),[D,C(E)])', '[0,1]', 'X(A(C(1),[D,C(E)]))'),
+		('A(C(1),[D,C(E)])', '[0,0]', 'A(X(C(1)),[D,C(E)])'),
+		('A(C(1),[D,C(E)])', '[0,1,1]', 'A(C(1),[D,X(C(E))])'),
+		('A(C(C(1)),B)', '[0,0,0]', 'A(C(X(C(1))),B)'),
+	]
+
+	def testLocal(self):
+		self.checkTransformation(
+			lambda p: path.Local(Rule('x -> X(x)'), p, match.ApplName('C')),
+			self.localTestCases
+		)
+		self.checkTransformation(
+			lambda p: path.Local(Rule('x -> X(x)'), p),
+			self.pathTestCases
+		)
+
 	rangeTestCases = [
 		('[0,1,2]', 0, 0, '[0,1,2]'),
 		('[0,1,2]', 0, 1, '[X(0),1,2]'),
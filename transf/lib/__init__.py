@@ -13,6 +13,7 @@ from transf.lib import congruent
 from transf.lib import lists
 from transf.lib import traverse
 from transf.lib import unify
+from transf.lib import memo
 
 from transf.lib import arith
 from transf.lib import strings
@@ -1,6 +1,8 @@
 '''Transformation combinators.'''
 
 
+import aterm.types
+
 from transf import exception
 from transf import transformation
 from transf import operate
@@ -288,3 +290,74 @@ def Switch(expr, cases, otherwise = None):
 				raise ValueError('duplicate case', term)
 			_cases[term] = action
 	return _Switch(expr, _cases, otherwise)
+
+
+class _Index(transformation.Transformation):
+
+	__slots__ = ['cases', 'nonappl', 'otherwise']
+
+	def __init__(self, cases, nonappl, otherwise):
+		transformation.Transformation.__init__(self)
+		self.cases = cases
+		self.nonappl = nonappl
+		self.otherwise = otherwise
+
+	def apply(self, term, ctx):
+		if term.type != aterm.types.APPL:
+			return self.nonappl.apply(term, ctx)
+		cases = self.cases
+		name = term.name
+		try:
+			action = cases[name, len(term.args)]
+		except KeyError:
+			try:
+				action = cases[name, None]
+			except KeyError:
+				action = self.otherwise
+		return action.apply(term, ctx)
+
+def Index(cases, nonappl = None, otherwise = None):
+	'''Index combination, which chooses the transformation to apply from the
+	symbol of application terms.
+
+	@param cases: sequence of (name, arity, transformation) tuples, where an
+	arity of None stands for the application terms with the given name and
+	an arity not given in other cases.
+	@param nonappl: optional transformation to be applied to terms other than
+	applications.
+	@param otherwise: optional transformation to be applied to application
+	terms not matching any of the cases.
+	'''
+	if nonappl is None:
+		nonappl = base.fail
+	if otherwise is None:
+		otherwise = base.fail
+	_cases = {}
+	for name, arity, action in cases:
+		if (name, arity) in _cases:
+			raise ValueError('duplicate case', name, arity)
+		_cases[name, arity] = action
+	return _Index(_cases, nonappl, otherwise)
+
+
+def IndexAlternatives(alternatives, cases, nonappl = (), otherwise = ()):
+	'''Index combination of alternatives, which are tried in order, but only
+	those given for the symbol of application terms. The alternatives are
+	referred by position, so that those shared by several cases are not
+	duplicated.
+
+	@param alternatives: sequence of transformations.
+	@param cases: sequence of (name, arity, positions) tuples, as in L{Index},
+	where positions are those of the alternatives to try.
+	@param nonappl: positions of the alternatives to try on terms other than
+	applications.
+	@param otherwise: positions of the alternatives to try on application
+	terms not matching any of the cases.
+	'''
+	def choice(positions):
+		return UndeterministicChoice([alternatives[i] for i in positions])
+	return Index(
+		[(name, arity, choice(positions)) for name, arity, positions in cases],
+		choice(nonappl),
+		choice(otherwise),
+	)
@@ -156,15 +156,12 @@ class MapConcat(operate.Unary):
 
 	def apply(self, trm, ctx):
 		assert aterm.types.isList(trm)
-		lsts = []
+		elms = []
 		for elm in trm:
 			lst = self.operand.apply(elm, ctx)
 			assert aterm.types.isList(lst)
-			lsts.append(lst)
-		res = trm.factory.makeNil()
-		for lst in reversed(lsts):
-			res = aterm.lists.extend(lst, res)
-		return res
+			elms.extend(lst)
+		return trm.factory.makeList(elms)
 
 
 def AtSuffix(operand):
@@ -0,0 +1,172 @@
+'''Memoization of transformations.
+
+A memoized transformation remembers its results (and failures) for the
+terms it was applied to, in a cache of bounded size. Terms are looked up by
+identity by default, which is cheap and suits the traversals which revisit
+shared or unchanged subterms; they can also be looked up structurally,
+including the annotations.
+
+Only transformations which do not read or write context variables declared
+outside them can be memoized. This is checked as the transformation is
+applied: it is given a sealed context, and on the first access to an outer
+variable memoization is turned off for good and the transformation is
+applied again with the regular context. The access is noticed even if the
+exception it raises is caught inside the transformation. Side effects other
+than through the context (e.g., on Python objects) are not detected.
+'''
+
+
+import sys
+import weakref
+
+import aterm.cache
+
+from transf import exception
+from transf import context
+from transf import operate
+
+
+# default maximum number of entries of each memo cache
+MAX_MEMO_LEN = 4096
+
+
+class _Impure(exception.Fatal):
+	'''Access to a variable declared outside the memoized transformation.'''
+
+	pass
+
+
+class _Sealed(context.Context):
+	'''Root context which refuses any access to its variables, and remembers
+	it, in case the exception raised is swallowed by the transformation.'''
+
+	__slots__ = ['violated']
+
+	def __init__(self):
+		context.Context.__init__(self)
+		self.violated = False
+
+	def set(self, name, value):
+		self.violated = True
+		raise _Impure('variable written by a memoized transformation', name)
+
+	def get(self, name):
+		self.violated = True
+		raise _Impure('variable read by a memoized transformation', name)
+
+	__setitem__ = set
+	__getitem__ = get
+
+
+# live memoized transformations, for reporting
+_memos = weakref.WeakKeyDictionary()
+_serial = 0
+
+
+class _Memo(operate.Unary):
+
+	__slots__ = ['cache', 'structural', 'pure', 'name', '__weakref__']
+
+	def __init__(self, operand, maxlen, structural, name):
+		operate.Unary.__init__(self, operand)
+		self.cache = aterm.cache.LRUCache(maxlen)
+		self.structural = structural
+		self.pure = True
+		self.name = name
+
+	def apply(self, trm, ctx):
+		if not self.pure:
+			return self.operand.apply(trm, ctx)
+		cache = self.cache
+		if self.structural:
+			key = trm
+		else:
+			# the cached entries keep the term alive, so its id is not reused
+			key = id(trm)
+		try:
+			# equivalent terms with different annotations are not reused
+			old, result = cache.lookup(key, lambda entry: entry[0] is trm or entry[0].isEqual(trm))
+		except KeyError:
+			pass
+		else:
+			if result is None:
+				raise exception.Failure('memoized failure', trm)
+			return result
+
+		sealed = _Sealed()
+		try:
+			result = self.operand.apply(trm, sealed)
+		except exception.Failure:
+			if sealed.violated:
+				return self._impure(trm, ctx)
+			cache[key] = trm, None
+			raise
+		except _Impure:
+			return self._impure(trm, ctx)
+		if sealed.violated:
+			return self._impure(trm, ctx)
+		cache[key] = trm, result
+		return result
+
+	def _impure(self, trm, ctx):
+		'''Turn memoization off for good, and apply with the regular context.'''
+		self.pure = False
+		self.cache.clear()
+		return self.operand.apply(trm, ctx)
+
+	def stats(self):
+		'''Return a dictionary with the cache statistics. See
+		L{aterm.cache.LRUCache.stats}.'''
+		stats = self.cache.stats()
+		stats['pure'] = self.pure
+		return stats
+
+	def clear(self):
+		'''Discard all memoized results.'''
+		self.cache.clear()
+
+	def __repr__(self):
+		return '<%s %s>' % (self.__class__.__name__, self.name)
+
+
+def Memo(operand, maxlen = MAX_MEMO_LEN, structural = False, name = None):
+	'''Memoize the results of a transformation.
+
+	@param operand: transformation to memoize, which should not access
+	context variables declared outside it.
+	@param maxlen: maximum number of memoized terms.
+	@param structural: whether terms are looked up structurally, instead of
+	by identity.
+	@param name: optional name used when reporting the statistics.
+	'''
+	global _serial
+	if name is None:
+		_serial += 1
+		name = 'memo%d' % _serial
+	memo = _Memo(operand, maxlen, structural, name)
+	_memos[memo] = None
+	return memo
+
+
+def getStats():
+	'''Return the statistics of all live memoized transformations, as a
+	dictionary of dictionaries indexed by name.'''
+	stats = {}
+	for memo in _memos.keys():
+		stats[memo.name] = memo.stats()
+	return stats
+
+
+def report(log = sys.stderr):
+	'''Write the hit rates of all live memoized transformations.'''
+	stats = getStats()
+	names = stats.keys()
+	names.sort()
+	for name in names:
+		s = stats[name]
+		if s['pure']:
+			state = ''
+		else:
+			state = ' (disabled)'
+		log.write('%s: %d hits, %d misses, %.1f%% hit rate, %d entries, %d evictions%s\n' % (
+			name, s['hits'], s['misses'], 100.0*s['ratio'], s['entries'], s['evictions'], state))
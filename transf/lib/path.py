@@ -34,9 +34,13 @@ get = combine.Composition(
 
 class Annotate(transformation.Transformation):
 	'''Transformation which annotates the path of terms and subterms for which the
-	supplied transformation succeeds.'''
+	supplied transformation succeeds.
 
-	def __init__(self, operand = None, root = None):
+	The subterms of an optional previous version of the term, annotated in the
+	same way, are reused where unchanged. See L{aterm.path.annotate}.
+	'''
+
+	def __init__(self, operand = None, root = None, previous = None):
 		transformation.Transformation.__init__(self)
 		if operand is None:
 			self.operand = base.ident
@@ -48,6 +52,7 @@ class Annotate(transformation.Transformation):
 			self.root = build.Term(root)
 		else:
 			self.root = root
+		self.previous = previous
 
 	def apply(self, term, ctx):
 		root = self.root.apply(term, ctx)
@@ -58,7 +63,7 @@ class Annotate(transformation.Transformation):
 				return False
 			else:
 				return True
-		return aterm.path.annotate(term, root, func)
+		return aterm.path.annotate(term, root, func, self.previous)
 
 annotate = Annotate(base.ident, build.nil)
 
@@ -83,7 +88,7 @@ class Project(transformation.Transformation):
 
 	def apply(self, term, ctx):
 		path = aterm.path.Path.fromTerm(self.path.apply(term, ctx))
-		return path.project(term)
+		return aterm.path.index(term).project(path)
 
 
 class SubTerm(transformation.Transformation):
@@ -100,7 +105,43 @@ class SubTerm(transformation.Transformation):
 	def apply(self, term, ctx):
 		path = aterm.path.Path.fromTerm(self.path.apply(term, ctx))
 		func = lambda term: self.operand.apply(term, ctx)
-		return path.transform(term, func)
+		return aterm.path.index(term).transform(path, func)
+
+
+class Local(transformation.Transformation):
+	'''Applies a transformation locally, to the innermost subterm along a path
+	for which a guard succeeds, or to the whole term if there is none, and
+	splices the result back. Only that subterm and its ancestors are visited,
+	so the cost does not depend on the size of the rest of the term.'''
+
+	def __init__(self, operand, path, guard = None):
+		transformation.Transformation.__init__(self)
+		self.operand = operand
+		if isinstance(path, aterm.term.Term):
+			self.path = build.Term(path)
+		else:
+			self.path = path
+		self.guard = guard
+
+	def apply(self, term, ctx):
+		path = aterm.path.Path.fromTerm(self.path.apply(term, ctx))
+		index = aterm.path.index(term)
+		indices = path.indices
+		if self.guard is not None:
+			subterms = [term]
+			for i in indices:
+				subterms.append(index.children(subterms[-1])[i])
+			depth = len(indices)
+			while depth:
+				try:
+					self.guard.apply(subterms[depth], ctx)
+				except exception.Failure:
+					depth -= 1
+				else:
+					break
+			path = aterm.path.Path(indices[:depth])
+		func = lambda term: self.operand.apply(term, ctx)
+		return index.transform(path, func)
 
 
 class Range(transformation.Transformation):
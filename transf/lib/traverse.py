@@ -1,8 +1,11 @@
 '''Term traversal transformations.'''
 
 
+import aterm.types
+
 from transf import exception
 from transf import transformation
+from transf import operate
 from transf.lib import base
 from transf import util
 from transf.lib import combine
@@ -87,6 +90,62 @@ def InnerMost(operand):
 	return innermost
 
 
+class _Normalize(operate.Unary):
+
+	def apply(self, trm, ctx):
+		return self.normalize(trm, ctx, {})
+
+	def normalize(self, trm, ctx, done):
+		# done maps the ids of the terms already normalized to their normal
+		# forms, and keeps the terms alive so that the ids are not reused
+		try:
+			return done[id(trm)][1]
+		except KeyError:
+			pass
+		operand = self.operand
+		seen = []
+		while True:
+			seen.append(trm)
+			type = trm.type
+			if type == aterm.types.APPL:
+				args = [self.normalize(arg, ctx, done) for arg in trm.args]
+				for old, new in zip(trm.args, args):
+					if old is not new:
+						trm = trm.factory.makeAppl(trm.name, args, trm.annotations)
+						break
+			elif type & aterm.types.LIST:
+				elms = list(trm)
+				args = [self.normalize(elm, ctx, done) for elm in elms]
+				for old, new in zip(elms, args):
+					if old is not new:
+						trm = trm.factory.makeList(args)
+						break
+			try:
+				trm = operand.apply(trm, ctx)
+			except exception.Failure:
+				break
+			try:
+				trm = done[id(trm)][1]
+			except KeyError:
+				pass
+			else:
+				break
+		done[id(trm)] = trm, trm
+		for old in seen:
+			done[id(old)] = old, trm
+		return trm
+
+def Normalize(operand):
+	'''Rewrite a term into its normal form, like L{InnerMost}, but without
+	traversing again the subterms which are already in normal form, such as
+	the ones reused by the result of a rewrite.
+
+	Subterms are recognized by identity, and are normalized once during each
+	application, so the operand should not have side effects.
+	'''
+	return _Normalize(operand)
+
+
 def AllTD(operand):
 	'''Apply a transformation to all subterms, but stops recursing
 	as soon as it finds a subterm to which the transformation succeeds.
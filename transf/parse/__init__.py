@@ -1,19 +1,29 @@
 '''Transformation parsing.'''
 
 
+import os
 import sys
 import inspect
 
-import antlr
-from antlraterm import Walker as Converter
-
-from transf.parse.lexer import Lexer
-from transf.parse.parser import Parser
 from transf.parse.compiler import Compiler
+from transf.parse import simplifier
+from transf.parse import cache
+
 
+# whether choices between many alternatives are indexed by symbol, which can
+# be disabled by setting the TRANSF_INDEX environment variable to 0; see
+# L{transf.parse.simplifier}
+index = os.environ.get('TRANSF_INDEX', '1') != '0'
 
 def _parse(buf, production="definitions", debug=False):
 	'''Generate a parser for a string buffer.'''
+	# NOTE: imported here, so that they are not loaded when all code is
+	# found in the persistent cache
+	import antlr
+	from antlraterm import Walker as Converter
+	from transf.parse.lexer import Lexer
+	from transf.parse.parser import Parser
+
 	lexer = Lexer(buf)
 	parser = Parser(lexer, debug=debug)
 	try:
@@ -27,7 +37,10 @@ def _parse(buf, production="definitions", debug=False):
 			lines = buf.split("\n")
 			line = lines[ex.line - 1]
 
-			frame = sys._getframe(3)
+			# report the location in the first caller outside this module
+			frame = sys._getframe(1)
+			while frame.f_back is not None and frame.f_globals.get('__name__') == __name__:
+				frame = frame.f_back
 			filename = frame.f_code.co_filename
 			name = frame.f_code.co_name
 			try:
@@ -48,11 +61,8 @@ def _parse(buf, production="definitions", debug=False):
 
 def _compile(buf, simplify=True, verbose=False, debug=False):
 	term = _parse(buf)
-	if False:
-		# FIXME: re-enable the simplifier
-		import transf.parse.simplifier
-		old = term
-		term = transf.parse.simplifier.simplify(term)
+	if simplify and index:
+		term = simplifier.simplify(term)
 	compiler = Compiler(debug=debug)
 	code = compiler.definitions(term)
 	if verbose:
@@ -70,7 +80,21 @@ def _print_code(code):
 		sys.stderr.write("%3d %s\n" % (lineno, line.expandtabs()))
 
 
-def _exec(code, globals_, locals_):
+def _load(buf, simplify=True, verbose=False, debug=False):
+	'''Get the code object for a string, from the persistent cache when
+	possible.'''
+	if verbose:
+		# the generated code is wanted
+		return compile(_compile(buf, simplify, verbose, debug), "<transf>", "exec")
+	key = cache.make_key(buf, simplify, debug, index)
+	code = cache.load(key)
+	if code is None:
+		code = compile(_compile(buf, simplify, verbose, debug), "<transf>", "exec")
+		cache.store(key, code)
+	return code
+
+
+def _exec(code, globals_, locals_, buf, simplify=True, debug=False):
 	'''Execute the compiled code in the caller's namespace.'''
 	from transf.parse import _builtins
 	globals_["__builtins__"] = _builtins
@@ -79,27 +103,28 @@ def _exec(code, globals_, locals_):
 	except NameError:
 		sys.stderr.write("globals: %s\n" % globals_.keys())
 		sys.stderr.write("locals: %s\n" % locals_.keys())
-		_print_code(code)
+		_print_code(_compile(buf, simplify=simplify, debug=debug))
 		raise
 	except:
-		_print_code(code)
+		_print_code(_compile(buf, simplify=simplify, debug=debug))
 		raise
 
 
 def Transfs(buf, simplify=True, verbose=False, debug=False):
 	'''Parse transformation definitions from a string.'''
-	code = _compile(buf, simplify=simplify, verbose=verbose, debug=debug)
+	code = _load(buf, simplify=simplify, verbose=verbose, debug=debug)
 	caller = sys._getframe(1)
 	globals_ = caller.f_globals
 	locals_ = caller.f_locals
-	_exec(code, globals_, locals_)
+	_exec(code, globals_, locals_, buf, simplify=simplify, debug=debug)
 
 
 def Transf(buf, simplify=True, verbose=False, debug=False):
 	'''Parse a transformation from a string.'''
-	code = _compile("_tmp = %s" % buf, simplify=simplify, verbose=verbose, debug=debug)
+	buf = "_tmp = %s" % buf
+	code = _load(buf, simplify=simplify, verbose=verbose, debug=debug)
 	caller = sys._getframe(1)
 	globals_ = caller.f_globals
 	locals_ = caller.f_locals.copy()
-	_exec(code, globals_, locals_)
+	_exec(code, globals_, locals_, buf, simplify=simplify, debug=debug)
 	return locals_["_tmp"]
@@ -8,6 +8,7 @@ from transf.lib.lists import *
 from transf.lib.strings import tostr
 from transf.lib.arith import *
 from transf.lib.iterate import *
+from transf.lib.memo import Memo
 
 from transf.lib import *
 
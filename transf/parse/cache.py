@@ -0,0 +1,122 @@
+'''Persistent cache of compiled transformation code.
+
+The code generated for transformation definitions is compiled into Python
+code objects, which are marshalled into files of a cache directory. The files
+are named after a hash of the definitions source, the compilation flags, the
+compiler version and the Python bytecode magic number, so that stale entries
+are never used.
+
+The cache directory defaults to C{~/.cache/idc/transf}, and can be changed
+with the C{TRANSF_CACHE} environment variable. Setting it to an empty string
+disables the cache.
+'''
+
+
+import os
+import imp
+import marshal
+
+try:
+	from hashlib import sha1 as _sha
+except ImportError:
+	from sha import new as _sha
+
+from transf.parse import compiler
+
+
+def _default_directory():
+	return os.path.join(os.path.expanduser('~'), '.cache', 'idc', 'transf')
+
+
+directory = os.environ.get('TRANSF_CACHE', _default_directory())
+
+
+_directory = os.path.dirname(os.path.abspath(__file__))
+_root = os.path.dirname(os.path.dirname(_directory))
+
+# sources which the generated code depends on; the parser modules are not
+# imported, as they are not needed when all code is found in the cache
+_sources = [
+	os.path.join(_directory, name)
+	for name in (
+		'compiler.py', 'simplifier.py', '_builtins.py',
+		'lexer.py', 'parser.g', 'parser.py',
+	)
+] + [
+	os.path.join(_root, name)
+	for name in ('antlraterm.g', 'antlraterm.py')
+]
+
+
+def _compiler_stamp():
+	'''Identify the compiler and parser sources, so that modifying them
+	without bumping the compiler version does not lead to stale entries.'''
+	stamp = []
+	for filename in _sources:
+		try:
+			st = os.stat(filename)
+		except OSError:
+			stamp.append(None)
+			continue
+		stamp.append((st.st_size, st.st_mtime))
+	return stamp
+
+_stamp = repr((compiler.VERSION, _compiler_stamp()))
+
+
+def make_key(buf, *flags):
+	'''Make the cache key of some transformation definitions.'''
+	digest = _sha()
+	digest.update(imp.get_magic())
+	digest.update(_stamp)
+	digest.update(repr(flags))
+	digest.update(buf)
+	return digest.hexdigest()
+
+
+def _path(key):
+	return os.path.join(directory, key + '.code')
+
+
+def load(key):
+	'''Load the code object cached under the given key, or return None.'''
+	if not directory:
+		return None
+	try:
+		fp = open(_path(key), 'rb')
+		try:
+			data = fp.read()
+		finally:
+			fp.close()
+		return marshal.loads(data)
+	except (IOError, OSError, EOFError, ValueError, TypeError):
+		return None
+
+
+def store(key, code):
+	'''Store a code object in the cache under the given key.
+
+	Failures are ignored, as the cache is merely an optimization.
+	'''
+	if not directory:
+		return
+	path = _path(key)
+	tmppath = '%s.%d.tmp' % (path, os.getpid())
+	try:
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		fp = open(tmppath, 'wb')
+		try:
+			fp.write(marshal.dumps(code))
+		finally:
+			fp.close()
+		# write to a temporary file and rename, so that concurrent processes
+		# never see partial entries
+		if os.name == 'nt' and os.path.exists(path):
+			os.remove(path)
+		os.rename(tmppath, path)
+	except (IOError, OSError):
+		try:
+			os.remove(tmppath)
+		except OSError:
+			pass
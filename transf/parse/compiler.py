@@ -14,6 +14,11 @@ class SemanticException(Exception):
 	pass
 
 
+# version of the generated code; bump it whenever the generated code changes,
+# to invalidate the persistent cache
+VERSION = 2
+
+
 # term operations
 ASSIGN, MATCH, BUILD, CONGRUENT = range(4)
 
@@ -241,6 +246,25 @@ class Compiler(walker.Walker):
 		a = self.transf(a)
 		return "(%s, %s)" % (c, a)
 
+	def transfIndex(self, alts, cases, nonappl, other):
+		alts = "[" + ",".join(map(self.transf, alts)) + "]"
+		cases = "[" + ",".join(map(self.doIndexCase, cases)) + "]"
+		nonappl = self.positions(nonappl)
+		other = self.positions(other)
+		return "transf.lib.combine.IndexAlternatives(%s, %s, %s, %s)" % (alts, cases, nonappl, other)
+
+	def doIndexCase(self, t):
+		n, a, p = t.rmatch("IndexCase(_, _, _)")
+		n = self._str(n)
+		a = self._int(a)
+		if a < 0:
+			a = None
+		p = self.positions(p)
+		return "(%r, %r, %s)" % (n, a, p)
+
+	def positions(self, p):
+		return repr([self._int(i) for i in p])
+
 	def transfJoin(self, l, r, u, i):
 		u = "[" + ",".join(map(self.var, u)) + "]"
 		i = "[" + ",".join(map(self.var, i)) + "]"
@@ -1,34 +1,201 @@
-from transf import lib
-from transf import parse
+'''Simplifies transformation definitions before they are compiled.
 
-simplify = lib.base.ident
+Choices between many alternatives, such as rule sets, are indexed by symbol:
+the alternatives whose first step matches an application term with a given
+name and arity are grouped, and the resulting C{Index} transformation
+dispatches on the symbol of the input term, trying only the alternatives that
+may apply, in their original order. Each alternative appears once in the
+C{Index}, and the cases refer to it by position. Alternatives which are
+skipped are those which would fail before binding any variable, so the
+result is the same.
+'''
 
-parse.Transfs('''
-applName =
-	?Rule(Appl(Str(_), Ident), _)  +
-	?Anon(Rule(Appl(Str(_), Ident), _))
 
+from sets import Set as set
 
-applNames =
-	?Choice(<Map(applName)>)
+import aterm.types
+from aterm import walker
 
-simplifyRule =
-	Rule(Appl(Str(name), Undef), build) ->
-		SwitchCase([Str(name)], Build(build))
-|	Anon(Rule(Appl(Str(name), Undef), build)) ->
-		SwitchCase([Str(name)], Build(build))
 
+# minimum number of alternatives with a known symbol for a choice to be indexed
+MIN_INDEX_ALTERNATIVES = 4
 
-simplifyChoice =
-	Choice(rules) ->
-		Switch(
-			Transf("project.name"),
-			<Filter(simplifyRule) rules>,
-			Choice(<Filter(Not(simplifyRule)) rules>)
-		)
-		#if Some(simplifyRule) rules
+# key of the terms other than applications
+NONAPPL = None
 
 
-simplify = BottomUp(Try(simplifyChoice))
+class Simplifier(walker.Walker):
 
-''', simplify=False)
+	def __init__(self, factory):
+		walker.Walker.__init__(self)
+		self.factory = factory
+
+
+	simplify = walker.Dispatch('simplify')
+
+	def simplifyChoice(self, o):
+		return self.choice(o)
+
+	def simplifyLeftChoice(self, l, r):
+		return self.choice([l, r])
+
+	def simplify_Appl(self, name, args):
+		return self.factory.makeAppl(name, [self.simplify(arg) for arg in args])
+
+	def simplify_List(self, elms):
+		return self.factory.makeList([self.simplify(elm) for elm in elms])
+
+	def simplify_Term(self, t):
+		return t
+
+	def flatten(self, t, alts):
+		'''Collect the alternatives of nested choices.'''
+		while t.type == aterm.types.APPL:
+			if t.name == 'Choice':
+				for o in t.args[0]:
+					self.flatten(o, alts)
+				return
+			if t.name != 'LeftChoice':
+				break
+			l, t = t.args
+			self.flatten(l, alts)
+		alts.append(t)
+
+	def choice(self, o):
+		alts = []
+		for t in o:
+			self.flatten(t, alts)
+		alts = [self.simplify(alt) for alt in alts]
+		heads = [self.head(alt) for alt in alts]
+
+		known = 0
+		keys = set()
+		for head in heads:
+			if head is not None:
+				known += 1
+				keys.update(head)
+		keys.discard(NONAPPL)
+		if known < MIN_INDEX_ALTERNATIVES or len(keys) < 2:
+			return self.alternatives(alts)
+
+		keys = list(keys)
+		# sort the keys, so that the generated code does not vary
+		keys.sort()
+		factory = self.factory
+		# the alternatives are listed once, and referred by position from
+		# the cases, as those which may apply to any term are shared by all
+		positions = range(len(alts))
+		cases = []
+		for key in keys:
+			name, arity = key
+			candidates = []
+			for i, head in zip(positions, heads):
+				if head is None or key in head or (name, None) in head:
+					candidates.append(i)
+			if arity is None:
+				arity = -1
+			cases.append(factory.makeAppl('IndexCase', [
+				factory.makeStr(name),
+				factory.makeInt(arity),
+				self.positions(candidates),
+			]))
+		nonappl = [i for i, head in zip(positions, heads) if head is None or NONAPPL in head]
+		other = [i for i, head in zip(positions, heads) if head is None]
+		return factory.makeAppl('Index', [
+			factory.makeList(alts),
+			factory.makeList(cases),
+			self.positions(nonappl),
+			self.positions(other),
+		])
+
+	def positions(self, positions):
+		return self.factory.makeList([self.factory.makeInt(i) for i in positions])
+
+	def alternatives(self, alts):
+		if not alts:
+			return self.factory.make('Fail')
+		if len(alts) == 1:
+			return alts[0]
+		return self.factory.make('Choice(_)', alts)
+
+
+	# The head of a transformation is the set of the symbols of the terms it
+	# may apply to, as (name, arity) tuples, (name, None) when the arity is
+	# not known, or NONAPPL for terms other than applications. It is None
+	# when the transformation may apply to any term.
+
+	head = walker.Dispatch('head')
+
+	def headMatch(self, t):
+		return self.pattern(t)
+
+	def headRule(self, m, b):
+		return self.pattern(m)
+
+	def headRuleIf(self, m, b, w):
+		return self.pattern(m)
+
+	def headComposition(self, l, r):
+		return self.head(l)
+
+	def headScope(self, vs, t):
+		return self.head(t)
+
+	def headFail(self):
+		return set()
+
+	def headChoice(self, o):
+		return self.union(o)
+
+	def headLeftChoice(self, l, r):
+		return self.union([l, r])
+
+	def headGuardedChoice(self, l, m, r):
+		return self.union([l, r])
+
+	def headIndex(self, alts, cases, nonappl, other):
+		return None
+
+	def head_Term(self, t):
+		return None
+
+	def union(self, o):
+		result = set()
+		for t in o:
+			head = self.head(t)
+			if head is None:
+				return None
+			result.update(head)
+		return result
+
+
+	pattern = walker.Dispatch('pattern')
+
+	def patternInt(self, i):
+		return set([NONAPPL])
+
+	patternReal = patternInt
+	patternStr = patternInt
+
+	def patternNil(self):
+		return set([NONAPPL])
+
+	def patternCons(self, h, t):
+		return set([NONAPPL])
+
+	def patternAppl(self, name, args):
+		return set([(self._str(name), len(args))])
+
+	def patternApplName(self, name):
+		return set([(self._str(name), None)])
+
+	def patternAnnos(self, t, a):
+		return self.pattern(t)
+
+	def pattern_Term(self, t):
+		return None
+
+
+def simplify(term):
+	'''Simplify the definitions of a transformation module.'''
+	return Simplifier(term.factory).simplify(term)
@@ -5,19 +5,54 @@ import sys
 import optparse
 import os
 import os.path
+import time
+import traceback
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(sys.argv[0]), '..')))
 
 import aterm.factory
+import aterm.write
 import box
 import ir.path
 import ir.check
 import ir.pprint
 import machine.pentium
+from machine.pentium import common
 
 
 factory = aterm.factory.factory
 
+_machine = None
+
+# parser used to load the assembly files
+_loader = 'antlr'
+
+# whether batch workers write binary output
+_batch_binary = False
+
+# whether batch workers translate the files as statement streams
+_batch_stream = False
+
+
+def get_machine():
+	'''Get the machine, which is created only once per process.'''
+	global _machine
+	if _machine is None:
+		_machine = machine.pentium.Pentium(_loader)
+	return _machine
+
+
+def configure(share = False, check = True, loader = 'antlr'):
+	global _loader
+	_loader = loader
+
+	if share:
+		factory.setMaximalSharing(True)
+
+	# also loads the translation rules
+	from machine.pentium import translator
+	translator.OpcodeDispatch.check = check
+
 
 def pretty_print(term):
 	boxes = ir.pprint.module(term)
@@ -28,7 +63,13 @@ def pretty_print(term):
 	sys.stderr.write(box.stringify(boxes, formatter))
 
 
-def translate(fpin, fpout, verbose = True):
+def translate(fpin, fpout, verbose = True, binary = False, check = True, jobs = 1, stream = False):
+	if stream:
+		if binary or jobs > 1:
+			raise ValueError('streaming translation only writes text, serially')
+		translate_stream(fpin, fpout, check)
+		return
+
 	if verbose:
 		sys.stderr.write('* %s *\n' % fpin.name)
 		sys.stderr.write('\n')
@@ -39,9 +80,10 @@ def translate(fpin, fpout, verbose = True):
 		sys.stderr.write('\n')
 		fpin.seek(0)
 
-	mach = machine.pentium.Pentium()
+	mach = get_machine()
 	term = mach.load(factory, fpin)
-	ir.check.module(term)
+	if check:
+		ir.check.module(term)
 
 	if verbose:
 		sys.stderr.write('** Low-level IR **\n')
@@ -50,8 +92,9 @@ def translate(fpin, fpout, verbose = True):
 		pretty_print(term)
 		sys.stderr.write('\n')
 
-	term = mach.translate(term)
-	ir.check.module(term)
+	term = mach.translate(term, jobs)
+	if check:
+		ir.check.module(term)
 
 	if verbose:
 		sys.stderr.write('** Translated IR **\n')
@@ -64,7 +107,149 @@ def translate(fpin, fpout, verbose = True):
 
 	term = ir.path.annotate(term)
 
-	term.writeToTextFile(fpout)
+	if binary:
+		# indexed, so that it can be loaded lazily
+		term.writeToBinaryFile(fpout, True)
+	else:
+		term.writeToTextFile(fpout)
+
+
+def check_stmts(stmts):
+	for stmt in stmts:
+		ir.check.stmt(stmt)
+		yield stmt
+
+
+def translate_stream(fpin, fpout, check = True):
+	'''Translate a file as a pipeline of generators, so that the memory use
+	does not depend on the size of the file.
+
+	The statements are checked and annotated one at a time, instead of the
+	whole module at once.'''
+	mach = get_machine()
+	stmts = mach.iterload(factory, fpin)
+	if check:
+		stmts = check_stmts(stmts)
+	stmts = mach.itertranslate(factory, stmts)
+	if check:
+		stmts = check_stmts(stmts)
+	stmts = ir.path.annotate_stmts(stmts)
+
+	# annotate an empty module to get the module annotations
+	module = ir.path.annotate(factory.makeAppl('Module', [factory.makeNil()]))
+	fpout.write(module.name + '(')
+	aterm.write.writeTextList(stmts, fpout)
+	fpout.write(')')
+	if module.annotations:
+		aterm.write.writeTextList(module.annotations, fpout, '{', '}')
+
+
+def output_name(path, binary = False):
+	root, ext = os.path.splitext(path)
+	if binary:
+		return root + '.baf'
+	else:
+		return root + '.aterm'
+
+
+def collect_files(args):
+	'''Expand the directories among the arguments into the assembly files
+	they contain.'''
+	paths = []
+	for arg in args:
+		if os.path.isdir(arg):
+			for dirpath, dirnames, filenames in os.walk(arg):
+				dirnames.sort()
+				filenames.sort()
+				for filename in filenames:
+					if os.path.splitext(filename)[1] in ('.s', '.asm'):
+						paths.append(os.path.join(dirpath, filename))
+		else:
+			paths.append(arg)
+	return paths
+
+
+def batch_init(share, check, binary, loader, stream = False):
+	'''Initialize a batch worker process.'''
+	global _batch_binary, _batch_stream
+	_batch_binary = binary
+	_batch_stream = stream
+	configure(share, check, loader)
+	get_machine()
+
+
+def batch_translate(path):
+	'''Translate a file in a batch, returning the path, the input size, the
+	elapsed time and the error message, if any.'''
+	start = time.time()
+	size = 0
+	error = None
+	# number the temporaries of each file from the start, so that the output
+	# does not depend on the files translated before in the same process
+	common.temp.tmp_no = 0
+	try:
+		size = os.path.getsize(path)
+		fpin = file(path, 'rt')
+		if _batch_binary:
+			mode = 'wb'
+		else:
+			mode = 'wt'
+		fpout = file(output_name(path, _batch_binary), mode)
+		try:
+			translate(fpin, fpout, 0, _batch_binary, stream = _batch_stream)
+		finally:
+			fpout.close()
+			fpin.close()
+	except KeyboardInterrupt:
+		raise
+	except:
+		error = traceback.format_exc()
+	return path, size, time.time() - start, error
+
+
+def batch(paths, jobs = 1, share = False, check = True, binary = False, loader = 'antlr', stream = False):
+	'''Translate many files, across several processes, and report a summary.'''
+	start = time.time()
+	if jobs > 1:
+		import multiprocessing
+		pool = multiprocessing.Pool(jobs, batch_init, (share, check, binary, loader, stream))
+		try:
+			results = pool.imap(batch_translate, paths)
+			results = report_progress(results, len(paths))
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		batch_init(share, check, binary, loader, stream)
+		results = report_progress((batch_translate(path) for path in paths), len(paths))
+	elapsed = time.time() - start
+
+	failures = [(path, error) for path, size, seconds, error in results if error is not None]
+	total_size = 0
+	for path, size, seconds, error in results:
+		total_size += size
+
+	for path, error in failures:
+		sys.stderr.write('FAILED: %s\n%s\n' % (path, error))
+	sys.stderr.write('%d files, %d succeeded, %d failed\n' % (
+		len(results), len(results) - len(failures), len(failures)))
+	if elapsed > 0:
+		sys.stderr.write('%.1f s, %.1f files/s, %.1f KB/s\n' % (
+			elapsed, len(results)/elapsed, total_size/1024.0/elapsed))
+	return not failures
+
+
+def report_progress(results, total):
+	done = []
+	for result in results:
+		done.append(result)
+		path, size, seconds, error = result
+		if error is None:
+			status = 'ok'
+		else:
+			status = 'FAILED'
+		sys.stderr.write('[%d/%d] %s %s (%.2f s)\n' % (len(done), total, path, status, seconds))
+	return done
 
 
 def main():
@@ -87,28 +272,77 @@ def main():
 		'-p', '--profile',
 		action = "store_true", dest = "profile", default = False,
 		help = "collect profiling information")
+	parser.add_option(
+		'-s', '--share',
+		action = "store_true", dest = "share", default = False,
+		help = "maximally share terms")
+	parser.add_option(
+		'-b', '--binary',
+		action = "store_true", dest = "binary", default = False,
+		help = "write the output in binary format")
+	parser.add_option(
+		'-j', '--jobs',
+		type = "int", dest = "jobs", default = 1,
+		help = "number of processes to translate with")
+	parser.add_option(
+		'--no-check',
+		action = "store_false", dest = "check", default = True,
+		help = "skip the validation of the intermediate representation")
+	parser.add_option(
+		'--loader',
+		type = "choice", dest = "loader", default = "antlr",
+		choices = ["antlr", "fast"],
+		help = "assembly parser, either antlr (default) or fast")
+	parser.add_option(
+		'--stream',
+		action = "store_true", dest = "stream", default = False,
+		help = "translate the statements one at a time, without holding the whole module in memory")
+	parser.add_option(
+		'--batch',
+		action = "store_true", dest = "batch", default = False,
+		help = "translate files and directories in batch, distributing the files among the processes")
 	(options, args) = parser.parse_args(sys.argv[1:])
 
+	if options.stream:
+		if options.binary:
+			parser.error("--stream cannot be used with --binary")
+		if options.jobs > 1 and not options.batch:
+			parser.error("--stream cannot be used with --jobs, except with --batch")
+
+	if options.batch:
+		if options.output is not None:
+			parser.error("--output cannot be used with --batch")
+		paths = collect_files(args)
+		if not batch(paths, options.jobs, options.share, options.check, options.binary, options.loader, options.stream):
+			sys.exit(1)
+		return
+
+	configure(options.share, options.check, options.loader)
+
 	for arg in args:
 		fpin = file(arg, 'rt')
 
+		if options.binary:
+			mode = 'wb'
+		else:
+			mode = 'wt'
+
 		if options.output is None:
-			root, ext = os.path.splitext(arg)
-			fpout = file(root + '.aterm', 'wt')
+			fpout = file(output_name(arg, options.binary), mode)
 		elif options.output is '-':
 			fpout = sys.stdout
 		else:
-			fpout = file(options.output, 'wt')
+			fpout = file(options.output, mode)
 
 		if options.profile:
 			import hotshot
 			root, ext = os.path.splitext(arg)
 			profname = root + '.prof'
 			prof = hotshot.Profile(profname, lineevents=0)
-			prof.runcall(translate, fpin, fpout, options.verbose)
+			prof.runcall(translate, fpin, fpout, options.verbose, options.binary, options.check, options.jobs, options.stream)
 			prof.close()
 		else:
-			translate(fpin, fpout, options.verbose)
+			translate(fpin, fpout, options.verbose, options.binary, options.check, options.jobs, options.stream)
 
 
 if __name__ == '__main__':
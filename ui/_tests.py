@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+'''Unit tests for the user interface package.'''
+
+
+import os
+import tempfile
+import unittest
+
+from aterm.factory import factory
+
+from ui import history
+
+
+class TestHistory(unittest.TestCase):
+
+	def states(self, n):
+		'''Generate successive states, each sharing the previous statements.'''
+		stmts = [factory.parse('Stmt(%d)' % i) for i in range(n)]
+		return [factory.makeAppl('Module', [factory.makeList(stmts[:i + 1])]) for i in range(n)]
+
+	def testUnshared(self):
+		a, b = self.states(2)
+		self.failUnlessEqual(history.unshared(a, a), 0)
+		# the module, the two list nodes, the new statement and its argument,
+		# and the end of the list, but not the first statement
+		self.failUnlessEqual(history.unshared(b, a), 6)
+		self.failUnlessEqual(history.unshared(a, None), 5)
+
+	def testUndoRedo(self):
+		a, b, c = self.states(3)
+		h = history.History()
+		self.failIf(h.can_undo())
+		self.failIf(h.can_redo())
+		self.failUnless(h.undo(a) is None)
+		h.push(a, b)
+		h.push(b, c)
+		self.failUnlessEqual(len(h), 2)
+		self.failUnless(h.undo(c) is b)
+		self.failUnless(h.undo(b) is a)
+		self.failIf(h.can_undo())
+		self.failUnless(h.redo(a) is b)
+		self.failUnless(h.can_redo())
+		# a new change discards the states which could be redone
+		h.push(b, a)
+		self.failIf(h.can_redo())
+		self.failUnless(h.undo(a) is b)
+		self.failUnless(h.undo(b) is a)
+
+	def testSize(self):
+		states = self.states(4)
+		h = history.History()
+		for i in range(3):
+			h.push(states[i], states[i + 1])
+		size = h.size
+		self.failUnless(size > 0)
+		current = h.undo(states[3])
+		current = h.undo(current)
+		h.push(current, states[0])
+		self.failUnlessEqual(len(h), 2)
+		self.failUnlessEqual(h.size, sum([size for term, size in h._undo]))
+
+	def testEviction(self):
+		states = self.states(6)
+		h = history.History(maxlen = 3)
+		for i in range(5):
+			h.push(states[i], states[i + 1])
+		self.failUnlessEqual(len(h), 3)
+		self.failUnlessEqual(h.evictions, 2)
+		current = states[5]
+		for i in range(4, 1, -1):
+			current = h.undo(current)
+			self.failUnless(current is states[i])
+		self.failIf(h.can_undo())
+
+	def testEvictionBySize(self):
+		a, b = self.states(2)
+		h = history.History(maxsize = 1)
+		# the last change can always be undone and redone
+		h.push(a, b)
+		self.failUnlessEqual(len(h), 1)
+		self.failUnless(h.can_undo())
+		self.failUnless(h.undo(b) is a)
+		self.failUnless(h.can_redo())
+		self.failUnless(h.redo(a) is b)
+
+	def testResize(self):
+		states = self.states(5)
+		h = history.History(maxlen = 10, maxsize = 1 << 20)
+		for i in range(4):
+			h.push(states[i], states[i + 1])
+		h.resize(maxlen = 2)
+		self.failUnlessEqual(len(h), 2)
+		self.failUnlessEqual(h.maxsize, 1 << 20)
+		h.resize(maxsize = None)
+		self.failUnlessEqual(h.maxlen, 2)
+		self.failUnless(h.maxsize is None)
+
+	def testLoad(self):
+		states = self.states(4)
+		h = history.History()
+		for position in range(len(states)):
+			current = h.load(states, position)
+			self.failUnless(current is states[position])
+			result, result_position = h.states(current)
+			self.failUnlessEqual(result_position, position)
+			self.failUnlessEqual(len(result), len(states))
+			for state, expected in zip(result, states):
+				self.failUnless(state is expected)
+
+
+class TestModel(unittest.TestCase):
+
+	class Refactoring:
+
+		def __init__(self, term):
+			self.term = term
+
+		def apply(self, term, args):
+			return self.term
+
+	def testHistory(self):
+		from ui import model
+		m = model.Model()
+		for i in range(3):
+			m.apply_refactoring(self.Refactoring(factory.parse('Module([Stmt(%d)])' % i)), [])
+		m.undo()
+		expected, position = m.history.states(m.get_term())
+		for binary in (False, True):
+			fd, filename = tempfile.mkstemp()
+			os.close(fd)
+			try:
+				m.export_history(filename, binary = binary)
+				other = model.Model()
+				other.import_history(filename)
+			finally:
+				os.remove(filename)
+			result, result_position = other.history.states(other.get_term())
+			self.failUnlessEqual(result_position, position)
+			self.failUnlessEqual(result, expected)
+			self.failUnless(other.can_undo())
+			self.failUnless(other.can_redo())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,6 +1,8 @@
 '''Box viewing.'''
 
 
+import bisect
+
 import gtk
 import pango
 
@@ -17,6 +19,7 @@ class Range:
 		self.start = start
 		self.end = end
 		self.subranges = []
+		self.starts = None
 
 	def __cmp__(self, other):
 		return cmp(self.start, other.start)
@@ -30,11 +33,24 @@ class Range:
 	def get_path_at_offset(self, offset):
 		if not self.contains(offset):
 			return None
-		for subrange in self.subranges:
-			path = subrange.get_path_at_offset(offset)
-			if path is not None:
-				return path
-		return self.path
+		range = self
+		while True:
+			subrange = range.get_subrange_at_offset(offset)
+			if subrange is None:
+				return range.path
+			range = subrange
+
+	def get_subrange_at_offset(self, offset):
+		# subranges follow each other, so the first one containing the offset
+		# is found by a binary search on their starts
+		starts = self.starts
+		if starts is None or len(starts) != len(self.subranges):
+			starts = self.starts = [subrange.start for subrange in self.subranges]
+		index = bisect.bisect_left(starts, offset)
+		for subrange in self.subranges[max(index - 1, 0):index + 1]:
+			if subrange.contains(offset):
+				return subrange
+		return None
 
 	def get_range_at_path(self, path):
 		# TODO: use a hash table
@@ -0,0 +1,160 @@
+"""Undo/redo history."""
+
+
+import aterm.types
+
+
+# default limits of the history
+MAX_HISTORY_LEN = 256
+MAX_HISTORY_SIZE = 64*1024*1024
+
+# default of the limits left unchanged
+_unchanged = object()
+
+# approximate size of a term node in memory, in bytes
+NODE_SIZE = 96
+
+
+def _children(term):
+	type = term.type
+	if type == aterm.types.APPL:
+		return term.args
+	if type == aterm.types.CONS:
+		return term.head, term.tail
+	return ()
+
+
+def unshared(term, other):
+	"""Count the nodes of a term which are not shared with another term, i.e.,
+	which are not the very same objects at the same position. Shared subterms
+	are not visited, so this takes time proportional to the changes."""
+	count = 0
+	stack = [(term, other)]
+	while stack:
+		term, other = stack.pop()
+		if term is other:
+			continue
+		count += 1
+		children = _children(term)
+		if other is not None and other.type == term.type:
+			others = _children(other)
+		else:
+			others = ()
+		for index in range(len(children)):
+			if index < len(others):
+				stack.append((children[index], others[index]))
+			else:
+				stack.append((children[index], None))
+	return count
+
+
+class History:
+	"""Undo/redo history of terms.
+
+	Terms are kept as they are, so the successive states share all the
+	structure left unchanged between them. The memory held by each state is
+	estimated from the nodes it does not share with the state which replaced
+	it. When the number of states or the estimated memory exceeds the limits,
+	the oldest states are discarded, except for the nearest ones, so that the
+	last change can always be undone and redone.
+	"""
+
+	def __init__(self, maxlen = MAX_HISTORY_LEN, maxsize = MAX_HISTORY_SIZE):
+		self.maxlen = maxlen
+		self.maxsize = maxsize
+		self.clear()
+
+	def clear(self):
+		# lists of (term, size) pairs, from the oldest to the newest state
+		self._undo = []
+		self._redo = []
+		self.size = 0
+		self.evictions = 0
+
+	def _entry(self, term, current):
+		size = unshared(term, current)*NODE_SIZE
+		self.size += size
+		return term, size
+
+	def push(self, term, current):
+		"""Record the term replaced by the current one, discarding the states
+		which could be redone."""
+		for redone, size in self._redo:
+			self.size -= size
+		self._redo = []
+		self._undo.append(self._entry(term, current))
+		self._shrink()
+
+	def undo(self, current):
+		"""Return the previous state, or None."""
+		if not self._undo:
+			return None
+		term, size = self._undo.pop()
+		self.size -= size
+		self._redo.append(self._entry(current, term))
+		self._shrink()
+		return term
+
+	def redo(self, current):
+		"""Return the next state, or None."""
+		if not self._redo:
+			return None
+		term, size = self._redo.pop()
+		self.size -= size
+		self._undo.append(self._entry(current, term))
+		self._shrink()
+		return term
+
+	def can_undo(self):
+		return bool(self._undo)
+
+	def can_redo(self):
+		return bool(self._redo)
+
+	def __len__(self):
+		return len(self._undo) + len(self._redo)
+
+	def _shrink(self):
+		"""Discard the oldest states until within limits, but always keeping
+		the nearest states which can be undone and redone."""
+		while (
+			(self.maxlen is not None and len(self) > self.maxlen) or
+			(self.maxsize is not None and self.size > self.maxsize)
+		):
+			if len(self._undo) > 1:
+				term, size = self._undo.pop(0)
+			elif len(self._redo) > 1:
+				# the farthest state which could be redone
+				term, size = self._redo.pop(0)
+			else:
+				break
+			self.size -= size
+			self.evictions += 1
+
+	def resize(self, maxlen = _unchanged, maxsize = _unchanged):
+		"""Change the limits, discarding states as necessary. Limits which are
+		not given are left unchanged, and None stands for no limit."""
+		if maxlen is not _unchanged:
+			self.maxlen = maxlen
+		if maxsize is not _unchanged:
+			self.maxsize = maxsize
+		self._shrink()
+
+	def states(self, current):
+		"""Return all the states, from the oldest to the newest, and the
+		position of the current one."""
+		undo = [term for term, size in self._undo]
+		redo = [term for term, size in self._redo]
+		redo.reverse()
+		return undo + [current] + redo, len(undo)
+
+	def load(self, states, position):
+		"""Replace the history with the given states, returning the current
+		one."""
+		self.clear()
+		for index in range(position):
+			self._undo.append(self._entry(states[index], states[index + 1]))
+		for index in range(len(states) - 1, position, -1):
+			self._redo.append(self._entry(states[index], states[index - 1]))
+		self._shrink()
+		return states[position]
@@ -146,7 +146,8 @@ class MainApp(gtk.Window):
 				self,
 				[
 					('Assembly Files', ['*.s', '*.asm']),
-					('Decompilation Projects', ['*.aterm']),
+					('Decompilation Projects', ['*.aterm', '*.baf']),
+					('Histories', ['*.aterms', '*.bafs']),
 					('All Files', ['*']),
 				],
 				'./examples',
@@ -157,8 +158,10 @@ class MainApp(gtk.Window):
 		if path is not None:
 			if path.endswith('.s'):
 				self.model.open_asm(path)
-			if path.endswith('.aterm'):
+			if path.endswith('.aterm') or path.endswith('.baf'):
 				self.model.open_ir(path)
+			if path.endswith('.aterms') or path.endswith('.bafs'):
+				self.model.import_history(path)
 
 	def on_save(self, action):
 		if self.model.filename is None:
@@ -172,8 +175,10 @@ class MainApp(gtk.Window):
 				self,
 				[
 					('Decompilation Project', ['*.aterm']),
+					('Binary Decompilation Project', ['*.baf']),
 					('C Source File', ['*.c']),
 					('History', ['*.aterms']),
+					('Binary History', ['*.bafs']),
 					('All Files', ['*']),
 				],
 				'./examples',
@@ -186,10 +191,15 @@ class MainApp(gtk.Window):
 			if path.endswith('.aterm'):
 				self.model.save_ir(path)
 				self.model.filename = path
+			if path.endswith('.baf'):
+				self.model.save_ir(path, binary = True)
+				self.model.filename = path
 			if path.endswith('.c'):
 				self.model.export_c(path)
 			if path.endswith('.aterms'):
 				self.model.export_history(path)
+			if path.endswith('.bafs'):
+				self.model.export_history(path, binary = True)
 
 	def on_quit(self, action):
 		self.quit()
@@ -40,7 +40,7 @@ class RefactorMenu(gtk.Menu):
 	def on_menuitem_realize(self, menuitem, refactoring):
 		term = self.model.get_term()
 		selection = self.model.get_selection()
-		if refactoring.applicable(term, selection):
+		if self.refactoring_factory.is_applicable(refactoring, term, selection):
 			menuitem.set_state(gtk.STATE_NORMAL)
 		else:
 			menuitem.set_state(gtk.STATE_INSENSITIVE)
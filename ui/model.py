@@ -3,9 +3,11 @@
 
 import aterm.factory
 import aterm.term
+import aterm.binary
 import ir.path
 import ir.pprint
 import box
+import ui.history
 
 
 _factory = aterm.factory.factory
@@ -21,10 +23,9 @@ class Model:
 		self._signal_handlers = {}
 		self._default_term = _factory.parse('Module([])')
 		self._default_selection = _factory.makeNil(), _factory.makeNil()
-		self._term = self._default_term
+		self._term = ir.path.annotate(self._default_term)
 		self._selection = self._default_selection
-		self._undo_history = []
-		self._redo_history = []
+		self.history = ui.history.History()
 		self.filename = None
 
 	def connect(self, signal, handler, *args):
@@ -44,8 +45,11 @@ class Model:
 		return self._term
 
 	def set_term(self, term):
-		# keep term paths annotated
-		self._term = ir.path.annotate(term)
+		# keep term paths annotated, only annotating again what changed; this
+		# only saves work when the new term shares the unchanged subterms, as
+		# the results of the refactorings applied with ir.path.ApplyIn do,
+		# and not when the whole term was deannotated, as with ir.path.Apply
+		self._term = ir.path.reannotate(term, self._term)
 		self._selection = self._default_selection
 		self.notify('notify::term', self._term)
 		self.notify('notify::selection', self._selection)
@@ -82,18 +86,25 @@ class Model:
 		self.clean_history()
 
 	def open_ir(self, filename):
-		"""Open a text file with the intermediate representation."""
+		"""Open a text or binary file with the intermediate representation."""
 		self.filename = filename
-		fp = file(filename, 'rt')
-		term = _factory.readFromTextFile(fp)
+		fp = file(filename, 'rb')
+		if aterm.binary.isBinaryFile(fp):
+			term = _factory.readFromBinaryFile(fp)
+		else:
+			term = _factory.readFromTextFile(fp)
 		self.set_term(term)
 		self.clean_history()
 
-	def save_ir(self, filename):
-		"""Save a text file with the intermediate representation."""
+	def save_ir(self, filename, binary = False):
+		"""Save a text or binary file with the intermediate representation."""
 		term = self.get_term()
-		fp = file(filename, 'wt')
-		term.writeToTextFile(fp)
+		if binary:
+			fp = file(filename, 'wb')
+			term.writeToBinaryFile(fp)
+		else:
+			fp = file(filename, 'wt')
+			term.writeToTextFile(fp)
 
 	def export_c(self, filename):
 		"""Export C code."""
@@ -104,10 +115,40 @@ class Model:
 		writer = box.Writer(formatter)
 		writer.write(boxes)
 
-	def export_history(self, filename):
-		terms = _factory.makeList(self._undo_history + [self.get_term()])
-		fp = file(filename, 'wt')
-		terms.writeToTextFile(fp)
+	def export_history(self, filename, binary = False):
+		"""Export the undo/redo history, as a C{History(states, position)}
+		term. The binary format writes the structure shared between states
+		only once."""
+		states, position = self.history.states(self.get_term())
+		term = _factory.makeAppl('History', [
+			_factory.makeList(states),
+			_factory.makeInt(position),
+		])
+		if binary:
+			fp = file(filename, 'wb')
+			term.writeToBinaryFile(fp)
+		else:
+			fp = file(filename, 'wt')
+			term.writeToTextFile(fp)
+
+	def import_history(self, filename):
+		"""Import an undo/redo history, in text or binary format. A plain
+		list of states, with the current one last, is also accepted."""
+		self.filename = None
+		fp = file(filename, 'rb')
+		if aterm.binary.isBinaryFile(fp):
+			term = _factory.readFromBinaryFile(fp)
+		else:
+			term = _factory.readFromTextFile(fp)
+		if _factory.match('History(_,_)', term):
+			states, position = term.args
+			states = list(states)
+			position = position.value
+		else:
+			states = list(term)
+			position = len(states) - 1
+		self.set_term(self.history.load(states, position))
+		self.notify('notify::history', self)
 
 	# TODO: Write a PDF exporter, probably using latex.
 
@@ -116,30 +157,27 @@ class Model:
 		old_term = self.get_term()
 		new_term = refactoring.apply(old_term, args)
 		self.set_term(new_term)
-		self._undo_history.append(old_term)
-		self._redo_history = []
+		self.history.push(old_term, self.get_term())
 		self.notify('notify::history', self)
 
 	def clean_history(self):
-		self._undo_history = []
-		self._redo_history = []
+		self.history.clear()
 		self.notify('notify::history', self)
 
 	def undo(self):
-		if self._undo_history:
-			self._redo_history.append(self.get_term())
-			self.set_term(self._undo_history.pop())
+		term = self.history.undo(self.get_term())
+		if term is not None:
+			self.set_term(term)
 			self.notify('notify::history', self)
 
 	def can_undo(self):
-		return bool(self._undo_history)
+		return self.history.can_undo()
 
 	def redo(self):
-		if self._redo_history:
-			self._undo_history.append(self.get_term())
-			self.set_term(self._redo_history.pop())
+		term = self.history.redo(self.get_term())
+		if term is not None:
+			self.set_term(term)
 			self.notify('notify::history', self)
 
 	def can_redo(self):
-		return bool(self._redo_history)
-
+		return self.history.can_redo()